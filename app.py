@@ -1,164 +1,623 @@
-from fastapi import FastAPI, Request, WebSocket, HTTPException
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
-from weaviate.classes.query import MetadataQuery
-import weaviate
-import asyncio  # import asyncio for the sleep function
+from weaviate.classes.query import Filter
+from weaviate.classes.data import DataObject
+from weaviate.util import generate_uuid5
+from pydantic import BaseModel
+from contextlib import asynccontextmanager, aclosing
+from starlette.websockets import WebSocketState
+import asyncio
+import json
 import os
-from visualizeData import prepare_graph_data
+import time
+import numpy as np
+from collectionReader import aiter_pages, aiter_filtered_pages, PAGE_SIZE
+from layoutCache import get_layout_cache, loaded_layout_caches
+from collectionVersion import collection_version, bump_collection_version
+from visualizeData import PROJECTION_ENGINES, clean_graph_rows
+from graphPayload import GRAPH_MEDIA_TYPES, encode_graph
+from graphIndex import MAX_VIEW_POINTS
+from jobQueue import job_queue, JobCancelled
+from metrics import stage, histogram, REGISTRY, SampledProfiler
 from chatCompletions import get_results
+from weaviateClient import weaviate_pool
+from vectorMirror import get_mirror, default_vector
+from ttlCache import TTLCache
+from issueContext import format_issue_context, format_similar_issues, SIMILAR_ISSUE_PROPERTIES
+from completionCache import completion_cache, content_hash, CompletionInterrupted
+from frameStream import FrameSender, SlowConsumer
+from chatSessions import chat_sessions, SUGGESTED_REPLY_PROMPT, SUGGESTION_PROMPT
 
 
 # Load environment variables
 load_dotenv()
 
-def connect_to_weaviate():
-    return weaviate.connect_to_wcs(
-        cluster_url=os.getenv("WCS_URL"),
-        auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WCS_API_KEY")),
-        headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
-    )
-
-def show_collection(client, collection_name):
+def show_collection(client, collection_name, batch_size: int = PAGE_SIZE, include_vector: bool = True):
+    """Stream the objects of a collection page by page."""
     collection = client.collections.get(collection_name)
-    response = collection.query.fetch_objects(include_vector=True)
-    return response
+    return aiter_pages(collection, batch_size=batch_size, include_vector=include_vector)
 
 def format_output(objects):
     data = [{"properties": o.properties, "vector": o.vector} for o in objects]
     return data
 
-def migrate_issue_to_solved(issue_id: str):
-    """Migrate a specific issue to the Solved collection."""
-    with connect_to_weaviate() as client:
-        github_issues = client.collections.get("GithubIssues")
-        solved = client.collections.get("Solved")
-
-        # Retrieve the specific issue by ID
-        response = github_issues.query.bm25(
-            query=issue_id,
-            query_properties=["issue_id"],
-            return_metadata=MetadataQuery(score=True),
-            limit=1
+async def collection_output_pages(client, collection_name):
+    """Yield formatted pages of a collection, taking the vectors from the local mirror.
+
+    Only vectors the mirror does not have yet are fetched from Weaviate (and
+    added to the mirror); with an empty mirror the first pass fills it.
+    """
+    mirror = get_mirror(collection_name)
+    collection = client.collections.get(collection_name)
+    use_mirror = len(mirror) > 0
+
+    async for page in show_collection(client, collection_name, include_vector=not use_mirror):
+        if not use_mirror:
+            await asyncio.to_thread(mirror.upsert_objects, page)
+            with stage("format_output"):
+                output = format_output(page)
+            yield output
+            continue
+
+        issue_ids = [o.properties["issue_id"] for o in page]
+        with stage("mirror_vectors"):
+            vectors, missing = await asyncio.to_thread(mirror.vectors, issue_ids)
+        if missing:
+            with stage("vector_fetch"):
+                response = await collection.query.fetch_objects(
+                    filters=Filter.by_property("issue_id").contains_any(missing),
+                    include_vector=True,
+                    limit=2 * len(missing)
+                )
+            await asyncio.to_thread(mirror.upsert_objects, response.objects)
+            vectors, missing = await asyncio.to_thread(mirror.vectors, issue_ids)
+        missing = set(missing)
+        yield [
+            {"properties": o.properties, "vector": None if issue_id in missing else {"default": vector}}
+            for o, issue_id, vector in zip(page, issue_ids, vectors)
+        ]
+
+# Issues moved per insert_many/delete_many round when migrating
+MIGRATE_BATCH_SIZE = int(os.getenv("MIGRATE_BATCH_SIZE", "100"))
+
+# Issues shared by /issue, /ws and the migration, keyed by issue_id
+issue_cache = TTLCache(
+    maxsize=int(os.getenv("ISSUE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ISSUE_CACHE_TTL", "300"))
+)
+
+async def get_issue(issue_id: str):
+    """Look up an issue by its exact issue_id.
+
+    Issues are imported under a UUID derived from their issue_id, so this is a
+    single lookup by id; objects imported before that fall back to a filter on
+    the issue_id property. Returns a dict with uuid, properties and vector, or
+    None if there is no such issue.
+    """
+    issue = issue_cache.get(issue_id)
+    if issue is not None:
+        return issue
+
+    client = await weaviate_pool.get()
+    github_issues = client.collections.get("GithubIssues")
+    obj = await github_issues.query.fetch_object_by_id(generate_uuid5(issue_id), include_vector=True)
+    if obj is None or obj.properties.get("issue_id") != issue_id:
+        response = await github_issues.query.fetch_objects(
+            filters=Filter.by_property("issue_id").equal(issue_id),
+            include_vector=True,
+            limit=5
         )
+        obj = next((o for o in response.objects if o.properties.get("issue_id") == issue_id), None)
+    if obj is None:
+        return None
+
+    issue = {"uuid": obj.uuid, "properties": obj.properties, "vector": obj.vector}
+    issue_cache.set(issue_id, issue)
+    return issue
+
+# Solved issues passed to the model with each suggested reply
+SIMILAR_SOLVED_K = int(os.getenv("SIMILAR_SOLVED_K", "3"))
+# Neighbour lists of open issues, keyed by issue_id
+similar_cache = TTLCache(maxsize=int(os.getenv("ISSUE_CACHE_SIZE", "1024")), ttl=float(os.getenv("SIMILAR_CACHE_TTL", "900")))
+background_tasks = set()
 
-        if not response.objects:
-            raise ValueError(f"Issue with ID {issue_id} not found.")
+def spawn(coro):
+    """Run a coroutine in the background and keep a reference until it is done."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
-        issue = response.objects[0]
+async def get_similar_solved(issue) -> list:
+    """Return the properties of the solved issues closest to `issue`, cached per issue.
 
-        # Migrate the issue to the Solved collection
-        solved.data.insert(
-                properties=issue.properties,  # A dictionary with the properties of the object
-                uuid=issue.uuid,  # A UUID for the object
-                vector=issue.vector
+    Neighbours come from the local Solved mirror when it holds the whole
+    collection (then only their properties are fetched), otherwise from a
+    near_vector query.
+    """
+    issue_id = issue["properties"]["issue_id"]
+    similar = similar_cache.get(issue_id)
+    if similar is not None:
+        return similar
+
+    vector = default_vector(issue["vector"])
+    if vector is None:
+        return []
+    client = await weaviate_pool.get()
+    solved = client.collections.get("Solved")
+    mirror = get_mirror("Solved")
+
+    if mirror.complete:
+        neighbours = await asyncio.to_thread(mirror.nearest, vector, SIMILAR_SOLVED_K, [issue_id])
+        neighbour_ids = [neighbour_id for neighbour_id, _ in neighbours]
+        similar = []
+        if neighbour_ids:
+            response = await solved.query.fetch_objects(
+                filters=Filter.by_property("issue_id").contains_any(neighbour_ids),
+                return_properties=SIMILAR_ISSUE_PROPERTIES,
+                limit=2 * len(neighbour_ids)
+            )
+            by_id = {o.properties["issue_id"]: o.properties for o in response.objects}
+            similar = [by_id[neighbour_id] for neighbour_id in neighbour_ids if neighbour_id in by_id]
+    else:
+        response = await solved.query.near_vector(
+            near_vector=vector,
+            limit=SIMILAR_SOLVED_K,
+            return_properties=SIMILAR_ISSUE_PROPERTIES
         )
+        similar = [o.properties for o in response.objects]
 
-        # Optionally, remove the original issue if required
-        github_issues.data.delete_by_id(issue.uuid)
-    print(f"Issue with ID {issue_id} migrated successfully to Solved.")
+    similar_cache.set(issue_id, similar)
+    return similar
 
+async def similar_solved_context(task) -> str:
+    """Wait for a precomputed neighbour lookup and format it for the prompt."""
+    try:
+        return format_similar_issues(await task)
+    except Exception as e:
+        print(f"Error retrieving similar solved issues: {e}")
+        return ""
+
+async def migrate_issues_to_solved(issue_ids: list) -> dict:
+    """Migrate many issues to the Solved collection with batched inserts and deletes.
+
+    An issue is only deleted from GithubIssues after it is in Solved, and
+    issues that already are in Solved (e.g. from an interrupted earlier call)
+    are not inserted again, so retrying a half-done migration neither loses
+    nor duplicates objects. Returns a status per issue_id: "migrated",
+    "already_solved", "not_found" or an error message.
+    """
+    client = await weaviate_pool.get()
+    github_issues = client.collections.get("GithubIssues")
+    solved = client.collections.get("Solved")
+    results = {}
+    issue_ids = list(dict.fromkeys(issue_ids))
+
+    for start in range(0, len(issue_ids), MIGRATE_BATCH_SIZE):
+        chunk = issue_ids[start:start + MIGRATE_BATCH_SIZE]
+
+        # Retrieve the issues by their exact issue_id
+        response = await github_issues.query.fetch_objects(
+            filters=Filter.by_property("issue_id").contains_any(chunk),
+            include_vector=True,
+            limit=2 * len(chunk)
+        )
+        wanted = set(chunk)
+        found = {o.properties["issue_id"]: o for o in response.objects if o.properties.get("issue_id") in wanted}
+
+        # Issues whose insert already happened in an earlier attempt
+        existing = set()
+        if found:
+            response = await solved.query.fetch_objects(
+                filters=Filter.by_id().contains_any([o.uuid for o in found.values()]),
+                limit=len(found)
+            )
+            existing = {o.uuid for o in response.objects}
+
+        # Migrate the issues to the Solved collection
+        to_insert = [(issue_id, o) for issue_id, o in found.items() if o.uuid not in existing]
+        inserted = set()
+        if to_insert:
+            response = await solved.data.insert_many([
+                DataObject(properties=o.properties, uuid=o.uuid, vector=default_vector(o.vector))
+                for _, o in to_insert
+            ])
+            for index, (issue_id, o) in enumerate(to_insert):
+                if index in response.errors:
+                    results[issue_id] = f"error: {response.errors[index].message}"
+                else:
+                    inserted.add(issue_id)
 
-app = FastAPI()
+        # Remove the originals that are safely in Solved now
+        done = [issue_id for issue_id, o in found.items() if issue_id in inserted or o.uuid in existing]
+        if done:
+            await github_issues.data.delete_many(where=Filter.by_id().contains_any([found[issue_id].uuid for issue_id in done]))
+            await asyncio.to_thread(bump_collection_version, "GithubIssues")
+            for issue_id in done:
+                results[issue_id] = "migrated"
+                issue_cache.pop(issue_id)
+            for layout_cache in loaded_layout_caches():
+                await asyncio.to_thread(layout_cache.remove, done)
+            await asyncio.to_thread(get_mirror("GithubIssues").delete, done)
+            await asyncio.to_thread(get_mirror("Solved").upsert_objects, [found[issue_id] for issue_id in done])
+
+        # Issues that are gone from GithubIssues may have been migrated by an earlier call
+        missing = [issue_id for issue_id in chunk if issue_id not in found]
+        if missing:
+            response = await solved.query.fetch_objects(
+                filters=Filter.by_property("issue_id").contains_any(missing),
+                limit=2 * len(missing)
+            )
+            already_solved = {o.properties.get("issue_id") for o in response.objects}
+            for issue_id in missing:
+                results[issue_id] = "already_solved" if issue_id in already_solved else "not_found"
+
+    migrated = sum(1 for status in results.values() if status == "migrated")
+    print(f"{migrated} of {len(issue_ids)} issues migrated successfully to Solved.")
+    return results
+
+async def migrate_issue_to_solved(issue_id: str):
+    """Migrate a specific issue to the Solved collection."""
+    status = (await migrate_issues_to_solved([issue_id]))[issue_id]
+    if status == "not_found":
+        raise ValueError(f"Issue with ID {issue_id} not found.")
+    if status.startswith("error"):
+        raise ValueError(f"Issue with ID {issue_id} could not be migrated: {status}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared Weaviate client once for the whole application
+    await weaviate_pool.connect()
+    await asyncio.to_thread(get_layout_cache)
+    try:
+        yield
+    finally:
+        await weaviate_pool.close()
+        job_queue.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-chat_contexts = {}
+# Share of HTTP requests that are profiled; profiles of the ones slower than SLOW_REQUEST_SECONDS are kept
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_seconds", "Seconds until the response of an HTTP request starts.", ["method", "route", "status"]
+)
+request_profiler = SampledProfiler(PROFILE_SAMPLE_RATE, SLOW_REQUEST_SECONDS, PROFILE_DIR)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    with request_profiler.profile(request.url.path):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            # Label by route template, not by path, so issue ids do not create new series
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route, status=status)
+    return response
+
+@app.get("/metrics")
+async def metrics():
+    """Timings and counters of this worker in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
+
+async def graph_point_pages(client, layout_cache):
+    """Yield the graph points page by page, syncing the layout with the collection on the way."""
+    # Read before the pages, so a change made during the sync triggers another one
+    version = await asyncio.to_thread(collection_version, "GithubIssues")
+
+    # Only touch the vectors when the collection changed since the cached layout
+    if not layout_cache.matches(version):
+        if len(layout_cache) == 0:
+            # The first layout needs every vector before it can be fitted; keep
+            # each page as float32 rows rather than the objects it came in
+            matrices, rows = [], []
+            async for page in collection_output_pages(client, "GithubIssues"):
+                page_vectors, page_rows = await asyncio.to_thread(clean_graph_rows, page)
+                if len(page_rows):
+                    matrices.append(page_vectors)
+                    rows.extend(page_rows)
+            if matrices:
+                vectors = np.vstack(matrices)
+                del matrices
+                with stage("layout_sync"):
+                    await asyncio.to_thread(layout_cache.fit, vectors, rows, version)
+        else:
+            seen_ids = set()
+            async for page in collection_output_pages(client, "GithubIssues"):
+                with stage("layout_sync"):
+                    points = await asyncio.to_thread(layout_cache.sync_page, page)
+                seen_ids.update(point["issue_id"] for point in points)
+                yield points
+            await asyncio.to_thread(layout_cache.finish_sync, seen_ids, version)
+            schedule_refit(layout_cache)
+            return
+
+    schedule_refit(layout_cache)
+    for points in layout_cache.iter_points(PAGE_SIZE):
+        yield points
+
+async def sync_layout(client, layout_cache):
+    """Sync the layout with the collection and return the collection version it was checked against.
+
+    An up-to-date layout is left alone without building any points.
+    """
+    version = await asyncio.to_thread(collection_version, "GithubIssues")
+    if layout_cache.matches(version):
+        schedule_refit(layout_cache)
+        return version
+    async for _ in graph_point_pages(client, layout_cache):
+        pass
+    return version
+
+def schedule_refit(layout_cache):
+    """Re-fit in the background once too many points were placed incrementally."""
+    if layout_cache.needs_refit():
+        layout_cache.refit_running = True
+        asyncio.get_running_loop().run_in_executor(None, layout_cache.refit)
+
+async def ndjson_lines(pages):
+    async for points in pages:
+        yield "".join(json.dumps(point) + "\n" for point in points)
+
+# Issue ids matching a set of graph filters, keyed by the collection version and the filter values
+graph_filter_cache = TTLCache(maxsize=256, ttl=float(os.getenv("GRAPH_FILTER_CACHE_TTL", "60")))
+
+def graph_filters(repo_name=None, state=None, urgency=None, issue_type=None, labels=None):
+    """Build the Weaviate filter for the /graph-data filter parameters, or None without any."""
+    filters = [
+        Filter.by_property(name).equal(value)
+        for name, value in (("repo_name", repo_name), ("state", state), ("urgency", urgency), ("type", issue_type))
+        if value
+    ]
+    if labels:
+        filters.append(Filter.by_property("labels").contains_any(labels))
+    return Filter.all_of(filters) if filters else None
+
+async def filtered_issue_ids(client, key, filters):
+    """Return the issue_ids of GithubIssues matching `filters`, without fetching any vectors."""
+    issue_ids = graph_filter_cache.get(key)
+    if issue_ids is None:
+        github_issues = client.collections.get("GithubIssues")
+        issue_ids = set()
+        async for page in aiter_filtered_pages(github_issues, filters, return_properties=["issue_id"]):
+            issue_ids.update(o.properties["issue_id"] for o in page)
+        graph_filter_cache.set(key, issue_ids)
+    return issue_ids
+
+def graph_response(request, etag, body, response_format, compress):
+    """A /graph-data body with its ETag, or a 304 when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=GRAPH_MEDIA_TYPES[response_format], headers=headers)
 
 @app.get("/graph-data")
-async def graph_data():
-    with connect_to_weaviate() as client:
-        collection = show_collection(client, "GithubIssues")
-        collection_output = format_output(collection.objects)
-        graph_json = prepare_graph_data(collection_output)
-        return JSONResponse(content=graph_json)
+async def graph_data(
+    request: Request,
+    engine: str = None,
+    response_format: str = Query("json", alias="format"),
+    repo_name: str = None,
+    state: str = None,
+    urgency: str = None,
+    issue_type: str = Query(None, alias="type"),
+    labels: list[str] = Query(None, alias="label"),
+    x_min: float = None,
+    x_max: float = None,
+    y_min: float = None,
+    y_max: float = None,
+    max_points: int = Query(None, ge=1)
+):
+    if engine is not None and engine not in PROJECTION_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown projection engine, use one of {', '.join(PROJECTION_ENGINES)}")
+    if response_format not in GRAPH_MEDIA_TYPES and response_format != "ndjson":
+        raise HTTPException(status_code=400, detail=f"Unknown format, use one of {', '.join(GRAPH_MEDIA_TYPES)} or ndjson")
+    viewport = (x_min, x_max, y_min, y_max)
+    if any(value is None for value in viewport):
+        if any(value is not None for value in viewport):
+            raise HTTPException(status_code=400, detail="A viewport needs x_min, x_max, y_min and y_max")
+        viewport = None
+    filters = graph_filters(repo_name, state, urgency, issue_type, labels)
+    view = filters is not None or viewport is not None or max_points is not None
+    if view and response_format == "ndjson":
+        raise HTTPException(status_code=400, detail="Filters and viewports are not supported with ndjson")
+    layout_cache = await asyncio.to_thread(get_layout_cache, engine)
+    client = await weaviate_pool.get()
+
+    # NDJSON: one point per line, sent while later pages are still being fetched
+    if response_format == "ndjson":
+        return StreamingResponse(ndjson_lines(graph_point_pages(client, layout_cache)), media_type="application/x-ndjson")
+
+    try:
+        version = await sync_layout(client, layout_cache)
+    except JobCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if len(layout_cache) < 2:
+        return JSONResponse(content={"error": "Not enough valid vectors to perform t-SNE."})
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+
+    # Filtered or viewport views: the matching points, clustered when there are too many to draw.
+    # They are encoded once per layout version and parameters, like the full payload.
+    if view:
+        filter_key = (repo_name, state, urgency, issue_type, tuple(sorted(labels or ())))
+        key = (version, filter_key, viewport, max_points or MAX_VIEW_POINTS, response_format, compress)
+        cached = layout_cache.cached_view(key)
+        if cached is None:
+            issue_ids = None
+            if filters is not None:
+                issue_ids = await filtered_issue_ids(client, (version,) + filter_key, filters)
+            columns, arrays = await asyncio.to_thread(layout_cache.view, issue_ids, viewport, max_points or MAX_VIEW_POINTS)
+            body = await asyncio.to_thread(encode_graph, columns, arrays, response_format, compress)
+            layout_cache.cache_view(key, columns["version"], body)
+            cached = (columns["version"], body)
+        layout_version, body = cached
+        etag = f'W/"{layout_cache.engine}-{layout_version}-{content_hash(key)[:16]}"'
+        return graph_response(request, etag, body, response_format, compress)
+
+    # The body only changes with the layout version, so browsers revalidate and get a 304 until then
+    layout_version, body = await asyncio.to_thread(layout_cache.payload, response_format, compress)
+    etag = f'W/"{layout_cache.engine}-{layout_version}-{response_format}"'
+    return graph_response(request, etag, body, response_format, compress)
+
+@app.get("/jobs")
+async def list_jobs():
+    """Status of the CPU-heavy jobs (layout projections) of this process."""
+    return {"jobs": [job.to_dict() for job in job_queue.jobs()]}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return job_queue.get(job_id).to_dict()
+
+class MigrateRequest(BaseModel):
+    issue_ids: list[str]
+
+@app.post("/issues/migrate")
+async def migrate_issues(payload: MigrateRequest):
+    """Move many issues to Solved at once and report the result per issue."""
+    results = await migrate_issues_to_solved(payload.issue_ids)
+    return {"results": results}
 
 @app.get("/issue/{issue_id}")
 async def issue_detail(request: Request, issue_id: str):
     try:
-        with connect_to_weaviate() as client:
-            # Query for the specific issue_id using BM25 or another query method
-            github_issues = client.collections.get("GithubIssues")
-            response = github_issues.query.bm25(
-                query=issue_id,
-                query_properties=["issue_id"],
-                return_metadata=MetadataQuery(score=True),
-                limit=1  # Limit to only the best match
-            )
+        # Look up the issue by its exact issue_id (cached across requests)
+        issue = await get_issue(issue_id)
+
+        # Check if any results were found
+        if issue is None:
+            raise HTTPException(status_code=404, detail="Issue not found")
 
-            # Check if any results were found
-            if not response.objects:
-                raise HTTPException(status_code=404, detail="Issue not found")
+        # Precompute the similar solved issues before the chat asks for them
+        if issue_id not in similar_cache:
+            spawn(get_similar_solved(issue))
 
-            # Extract issue properties
-            issue_details = response.objects[0].properties
-            return templates.TemplateResponse("issue_detail.html", {"request": request, "issue": issue_details})
+        # Extract issue properties
+        issue_details = issue["properties"]
+        return templates.TemplateResponse(request, "issue_detail.html", {"issue": issue_details})
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error querying issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
     
+async def get_similar_solved_by_id(issue_id: str) -> list:
+    """Similar solved issues of an issue that is not loaded yet (a resumed chat)."""
+    issue = await get_issue(issue_id)
+    return [] if issue is None else await get_similar_solved(issue)
+
 @app.websocket("/ws/{issue_id}")
-async def websocket_endpoint(websocket: WebSocket, issue_id: str):
+async def websocket_endpoint(websocket: WebSocket, issue_id: str, session: str = None):
     await websocket.accept()
+    frames = FrameSender(websocket)
+    similar_task = None
     try:
-        # Retrieve issue details using the provided issue_id
-        with connect_to_weaviate() as client:
-            github_issues = client.collections.get("GithubIssues")
-            response = github_issues.query.bm25(
-                query=issue_id,
-                query_properties=["issue_id"],
-                return_metadata=MetadataQuery(score=True),
-                limit=1
-            )
-            if not response.objects:
-                await websocket.send_text("No details found for this issue.")
-                await websocket.close()
+        # Resume an earlier chat about this issue with its conversation as it was
+        chat = await asyncio.to_thread(chat_sessions.get, session) if session else None
+        if chat is not None and chat.issue_id == issue_id:
+            await frames.send("session", chat.id)
+            await frames.send("history", json.dumps(chat.history()))
+        else:
+            # Retrieve issue details using the provided issue_id
+            issue = await get_issue(issue_id)
+            if issue is None:
+                await frames.send("error", "No details found for this issue.")
                 return
-            issue_details = response.objects[0].properties
+            issue_details = issue["properties"]
+            # Look up the similar solved issues while the user reads the issue
+            similar_task = asyncio.ensure_future(get_similar_solved(issue))
 
-        # Start conversation with the issue context
-        issue_context_message = f"You are discussing an issue with the following details: {issue_details}"
-        await websocket.send_text(issue_context_message)
-
-        # Initialize conversation
-        conversation = [{"role": "system", "content": issue_context_message}]
+            # Start conversation with the issue context
+            issue_context_message = format_issue_context(issue_details)
+            chat = await asyncio.to_thread(
+                chat_sessions.create, issue_id, content_hash(issue_details),
+                [{"role": "system", "content": issue_context_message}]
+            )
+            await frames.send("session", chat.id)
+            await frames.send("context", issue_context_message)
+        conversation = chat.conversation
+        issue_hash = chat.issue_hash
 
         # WebSocket message handling
         while True:
             data = await websocket.receive_text()
             if data == "suggested_reply":
-                # Add a special prompt for generating a solution
-                conversation.append({"role": "user", "content": "Write a suggested reply to solve the issue. Start directly with the reply!"})
-
-                # Stream the suggested reply incrementally
-                async for result in get_results("Provide a suggested solution to fix the issue.", conversation):
-                    await websocket.send_text(f"suggested_reply:{result}")
-                    await asyncio.sleep(0)
-                await websocket.send_text("suggested_reply:__message_finished__")
+                # Instructions for a solution, with similar solved issues as reference; they go along with
+                # this completion only and are not kept in the conversation
+                context = SUGGESTED_REPLY_PROMPT
+                if similar_task is None:
+                    similar_task = asyncio.ensure_future(get_similar_solved_by_id(issue_id))
+                similar_context = await similar_solved_context(similar_task)
+                if similar_context:
+                    context += "\n\n" + similar_context
+
+                # Stream the suggested reply incrementally, replayed from the completion cache when the
+                # same issue and conversation were answered before; closing the generator aborts the completion
+                suggestion = completion_cache.stream(SUGGESTION_PROMPT, conversation, issue_hash, context)
+                try:
+                    async with aclosing(suggestion) as results:
+                        await frames.stream("suggested_reply", results)
+                except CompletionInterrupted as e:
+                    await frames.send("error", f"Error: {str(e)}")
+                    continue
+                await asyncio.to_thread(chat_sessions.save, chat)
             elif data == "resolve_issue":
                 try:
                     # Migrate the specific issue to Solved
-                    migrate_issue_to_solved(issue_id)
-                    await websocket.send_text("Issue resolved and migrated to Solved.")
+                    await migrate_issue_to_solved(issue_id)
+                    await frames.send("resolved", "Issue resolved and migrated to Solved.")
                 except ValueError as e:
-                    await websocket.send_text(f"Error: {str(e)}")
+                    await frames.send("error", f"Error: {str(e)}")
             else:
                 # Handle regular user input
-                async for result in get_results(data, conversation):
-                    await websocket.send_text(result)
-                    await asyncio.sleep(0)
+                async with aclosing(get_results(data, conversation)) as results:
+                    await frames.stream("reply", results)
+                await asyncio.to_thread(chat_sessions.save, chat)
+    except WebSocketDisconnect:
+        print(f"Websocket for issue {issue_id} disconnected.")
+    except SlowConsumer as e:
+        print(f"Dropping websocket for issue {issue_id}: {e}")
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1013)
     finally:
-        await websocket.close()
+        if similar_task is not None and not similar_task.done():
+            similar_task.cancel()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
 
 
 @app.get("/chat-history/{chat_id}")
 async def get_chat_history(chat_id: str):
-    return {"history": chat_contexts.get(chat_id, [])}
+    chat = await asyncio.to_thread(chat_sessions.get, chat_id)
+    return {"history": chat.history() if chat is not None else []}
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import json
+import re
+import socket
+import threading
+import time
+import zlib
+from collections import Counter
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from syntheticData import TOPICS, COMMON_WORDS, text_vector
+
+# Words the streamed replies are made of
+REPLY_WORDS = tuple(word for topic in TOPICS for word in topic) + COMMON_WORDS
+
+
+def _score(text: str) -> str:
+    """Deterministic urgency 1-4 of a prompt."""
+    return str(1 + zlib.crc32(text.encode("utf-8")) % 4)
+
+
+class FakeOpenAI:
+    """OpenAI-compatible HTTP server for chat completions and embeddings.
+
+    Chat completions wait `latency` seconds before the first token (or the
+    whole answer), then stream `reply_tokens` words `token_interval` seconds
+    apart as server-sent events. Urgency prompts get a score 1-4, JSON
+    prompts a score per listed id, and embeddings are the deterministic
+    vectors of syntheticData.text_vector. Point the openai client at it with
+    OPENAI_BASE_URL=<server.base_url>.
+    """
+
+    def __init__(self, latency: float = 0.2, token_interval: float = 0.01, reply_tokens: int = 60,
+                 dimensions: int = 1536):
+        self.latency = latency
+        self.token_interval = token_interval
+        self.reply_tokens = reply_tokens
+        self.dimensions = dimensions
+        self.requests = Counter()
+        self.app = Starlette(routes=[
+            Route("/v1/chat/completions", self.chat_completions, methods=["POST"]),
+            Route("/v1/embeddings", self.embeddings, methods=["POST"]),
+        ])
+        self._server = None
+        self._thread = None
+        self.base_url = None
+
+    def _reply(self, prompt: str) -> list:
+        offset = zlib.crc32(prompt.encode("utf-8"))
+        return [REPLY_WORDS[(offset + i * 7) % len(REPLY_WORDS)] + " " for i in range(self.reply_tokens)]
+
+    def _answer(self, body: dict) -> str:
+        prompt = body["messages"][-1]["content"] or ""
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            ids = re.findall(r"^id: (.*)$", prompt, re.MULTILINE)
+            return json.dumps({"scores": [{"id": issue_id, "urgency": _score(issue_id)} for issue_id in ids]})
+        if body.get("max_tokens") == 1:
+            return _score(prompt)
+        return "".join(self._reply(prompt))
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        created = int(time.time())
+        completion_id = f"chatcmpl-{self.requests['chat'] + 1}"
+        self.requests["chat"] += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.latency)
+            content = self._answer(body)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+            })
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }) + "\n\n"
+
+        async def events():
+            await asyncio.sleep(self.latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(self._reply(body["messages"][-1]["content"] or "")):
+                if i:
+                    await asyncio.sleep(self.token_interval)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def embeddings(self, request: Request):
+        body = await request.json()
+        self.requests["embeddings"] += 1
+        texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+        dimensions = body.get("dimensions") or self.dimensions
+        await asyncio.sleep(self.latency)
+        data = []
+        for index, text in enumerate(texts):
+            vector = text_vector(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(len(text.split()) for text in texts)
+        return JSONResponse({
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    def start(self) -> str:
+        """Serve on a free local port in a background thread and return the base URL."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        config = uvicorn.Config(self.app, log_level="warning", access_log=False, lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("The fake OpenAI server did not start")
+            time.sleep(0.01)
+        self.base_url = f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join()
+            self._server = None
@@ -0,0 +1,507 @@
+import asyncio
+import fnmatch
+import math
+import threading
+import time
+import uuid as uuid_module
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+import weaviate
+from weaviate.collections.classes.aggregate import AggregateReturn
+from weaviate.classes.query import Filter
+from weaviate.collections.classes.batch import BatchObject, BatchObjectReturn
+from weaviate.collections.classes.internal import MetadataReturn, Object, QueryReturn
+from weaviate.util import generate_uuid5, get_valid_uuid
+from syntheticData import text_vector
+
+# Objects sent per round trip by the fake batch context
+BATCH_FLUSH_SIZE = 100
+
+
+def _contains(value, expected) -> bool:
+    values = value if isinstance(value, list) else [value]
+    return any(str(item) in expected for item in values)
+
+
+def _matches(filters, object_uuid: str, properties: dict) -> bool:
+    """Evaluate a weaviate.classes.query.Filter against one object."""
+    if filters is None:
+        return True
+    operator = filters.operator.value
+    if operator == "And":
+        return all(_matches(f, object_uuid, properties) for f in filters.filters)
+    if operator == "Or":
+        return any(_matches(f, object_uuid, properties) for f in filters.filters)
+    if operator == "Not":
+        return not _matches(filters.filters, object_uuid, properties)
+    if not isinstance(filters.target, str):
+        raise NotImplementedError("The fake collection only filters by id and by property")
+    value = object_uuid if filters.target == "_id" else properties.get(filters.target)
+    expected = filters.value
+    if operator == "IsNull":
+        return (value is None) == expected
+    if value is None:
+        return False
+    if operator == "Equal":
+        return value == expected or (isinstance(value, list) and expected in value)
+    if operator == "NotEqual":
+        return value != expected
+    if operator == "GreaterThan":
+        return value > expected
+    if operator == "GreaterThanEqual":
+        return value >= expected
+    if operator == "LessThan":
+        return value < expected
+    if operator == "LessThanEqual":
+        return value <= expected
+    if operator == "Like":
+        return fnmatch.fnmatchcase(str(value), expected)
+    if operator in ("ContainsAny", "ContainsAll", "ContainsNone"):
+        expected = {str(item) for item in expected}
+        if operator == "ContainsAll":
+            values = {str(item) for item in (value if isinstance(value, list) else [value])}
+            return expected <= values
+        return _contains(value, expected) == (operator == "ContainsAny")
+    raise NotImplementedError(f"Filter operator {operator} is not supported by the fake collection")
+
+
+class FakeCollection:
+    """The objects of one collection, held in memory.
+
+    Queries walk the objects in uuid (or sort property) order from the cursor
+    and stop after `limit` matches; filters on the id or issue_id are answered
+    from an index, like the inverted index of the real server would.
+    """
+
+    def __init__(self, name: str, dimensions: int):
+        self.name = name
+        self.dimensions = dimensions
+        self._objects = {}
+        self._by_issue_id = {}
+        self._orders = {}
+        self._matrix = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def _changed(self):
+        self._orders = {}
+        self._matrix = None
+
+    def put(self, properties: dict, object_uuid=None, vector=None) -> str:
+        """Insert or replace an object; without a vector the title is vectorized like text2vec-openai would."""
+        if object_uuid is None:
+            object_uuid = generate_uuid5(properties.get("issue_id", str(uuid_module.uuid4())))
+        object_uuid = get_valid_uuid(object_uuid)
+        if isinstance(vector, dict):
+            vector = vector.get("default")
+        if vector is None:
+            vector = text_vector(str(properties.get("title", "")), self.dimensions)
+        with self._lock:
+            previous = self._objects.get(object_uuid)
+            if previous is not None and previous[0].get("issue_id") is not None:
+                self._by_issue_id.pop(previous[0]["issue_id"], None)
+            self._objects[object_uuid] = (dict(properties), np.asarray(vector, dtype=np.float32))
+            if properties.get("issue_id") is not None:
+                self._by_issue_id[properties["issue_id"]] = object_uuid
+            self._changed()
+        return object_uuid
+
+    def put_many(self, issues: list, vectors=None):
+        """Seed objects without any latency; vectors default to the title vectors."""
+        for i, properties in enumerate(issues):
+            self.put(properties, vector=None if vectors is None else vectors[i])
+
+    def delete(self, filters) -> int:
+        with self._lock:
+            deleted = [object_uuid for object_uuid, _ in self._scan(filters)]
+            for object_uuid in deleted:
+                properties, _ = self._objects.pop(object_uuid)
+                if properties.get("issue_id") is not None:
+                    self._by_issue_id.pop(properties["issue_id"], None)
+            self._changed()
+        return len(deleted)
+
+    def _order(self, prop: str):
+        """Sort keys and uuids of all objects by a property ("_id" for the uuid cursor)."""
+        order = self._orders.get(prop)
+        if order is None:
+            if prop == "_id":
+                uuids = sorted(self._objects)
+                keys = uuids
+            else:
+                pairs = sorted((str(properties.get(prop, "")), object_uuid) for object_uuid, (properties, _) in self._objects.items())
+                keys = [key for key, _ in pairs]
+                uuids = [object_uuid for _, object_uuid in pairs]
+            order = self._orders[prop] = (keys, uuids)
+        return order
+
+    def _indexed(self, filters):
+        """The uuids a filter on the id or issue_id can match, or None if it needs a scan."""
+        if filters is None:
+            return None
+        operator = filters.operator.value
+        if operator == "And":
+            for f in filters.filters:
+                uuids = self._indexed(f)
+                if uuids is not None:
+                    return uuids
+            return None
+        if operator not in ("Equal", "ContainsAny") or filters.target not in ("_id", "issue_id"):
+            return None
+        values = [filters.value] if operator == "Equal" else filters.value
+        if filters.target == "_id":
+            return sorted(str(value) for value in values if str(value) in self._objects)
+        return sorted(self._by_issue_id[value] for value in values if value in self._by_issue_id)
+
+    def _cursor_start(self, filters, prop: str, keys: list) -> int:
+        # A "greater than" on the sort property skips straight to the cursor position
+        candidates = filters.filters if filters is not None and filters.operator.value == "And" else [filters]
+        for f in candidates:
+            if f is not None and f.operator.value == "GreaterThan" and f.target == prop:
+                return bisect_right(keys, str(f.value))
+        return 0
+
+    def _scan(self, filters, sort=None, after=None):
+        """Yield (uuid, properties) of the matching objects in cursor or sort order."""
+        uuids = self._indexed(filters)
+        if uuids is None:
+            prop = sort.sorts[0].prop if sort is not None else "_id"
+            keys, uuids = self._order(prop)
+            start = self._cursor_start(filters, prop, keys)
+            if after is not None:
+                start = max(start, bisect_right(keys, str(after)))
+            uuids = uuids[start:]
+        else:
+            if sort is not None:
+                uuids.sort(key=lambda object_uuid: str(self._objects[object_uuid][0].get(sort.sorts[0].prop, "")))
+            if after is not None:
+                uuids = [object_uuid for object_uuid in uuids if object_uuid > str(after)]
+        for object_uuid in list(uuids):
+            item = self._objects.get(object_uuid)
+            if item is not None and _matches(filters, object_uuid, item[0]):
+                yield object_uuid, item[0]
+
+    def _object(self, object_uuid: str, include_vector=False, return_properties=None, metadata=None) -> Object:
+        properties, vector = self._objects[object_uuid]
+        if return_properties is not None:
+            properties = {name: properties[name] for name in return_properties if name in properties}
+        return Object(
+            uuid=uuid_module.UUID(object_uuid),
+            metadata=metadata or MetadataReturn(),
+            properties=dict(properties),
+            references=None,
+            vector={"default": vector.tolist()} if include_vector else {},
+            collection=self.name
+        )
+
+    def fetch_objects(self, limit=None, offset=None, after=None, filters=None, sort=None,
+                      include_vector=False, return_properties=None, **kwargs) -> QueryReturn:
+        if after is not None and (filters is not None or sort is not None):
+            raise weaviate.exceptions.WeaviateInvalidInputError("A cursor (after) cannot be combined with filters or sorting")
+        limit = limit or 100
+        with self._lock:
+            objects = []
+            for index, (object_uuid, _) in enumerate(self._scan(filters, sort, after)):
+                if offset and index < offset:
+                    continue
+                objects.append(self._object(object_uuid, include_vector, return_properties))
+                if len(objects) >= limit:
+                    break
+        return QueryReturn(objects=objects)
+
+    def fetch_object_by_id(self, object_uuid, include_vector=False, return_properties=None, **kwargs):
+        with self._lock:
+            object_uuid = str(object_uuid)
+            if object_uuid not in self._objects:
+                return None
+            return self._object(object_uuid, include_vector, return_properties)
+
+    def near_vector(self, near_vector, limit=None, filters=None, include_vector=False,
+                    return_properties=None, **kwargs) -> QueryReturn:
+        """Exact cosine kNN over all vectors."""
+        limit = limit or 10
+        with self._lock:
+            if self._matrix is None:
+                uuids = list(self._objects)
+                matrix = np.stack([self._objects[object_uuid][1] for object_uuid in uuids]) if uuids else np.zeros((0, self.dimensions), dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1)
+                norms[norms == 0] = 1.0
+                self._matrix = (uuids, matrix / norms[:, None])
+            uuids, matrix = self._matrix
+            query = np.asarray(near_vector, dtype=np.float32)
+            distances = 1.0 - matrix @ (query / (np.linalg.norm(query) or 1.0))
+            objects = []
+            for index in np.argsort(distances):
+                object_uuid = uuids[index]
+                if _matches(filters, object_uuid, self._objects[object_uuid][0]):
+                    metadata = MetadataReturn(distance=float(distances[index]))
+                    objects.append(self._object(object_uuid, include_vector, return_properties, metadata))
+                    if len(objects) >= limit:
+                        break
+        return QueryReturn(objects=objects)
+
+    def bm25(self, query, query_properties=None, limit=None, filters=None, include_vector=False,
+             return_properties=None, **kwargs) -> QueryReturn:
+        """Keyword search scored with BM25 over the given (default: title and body) properties."""
+        limit = limit or 10
+        terms = set(str(query).lower().split())
+        query_properties = [name.split("^")[0] for name in query_properties or ("title", "body")]
+        with self._lock:
+            documents = []
+            for object_uuid, properties in self._scan(filters):
+                words = " ".join(str(properties.get(name, "")) for name in query_properties).lower().split()
+                documents.append((object_uuid, Counter(words), len(words)))
+            if not documents:
+                return QueryReturn(objects=[])
+            average_length = sum(length for _, _, length in documents) / len(documents)
+            frequency = {term: sum(1 for _, counts, _ in documents if term in counts) for term in terms}
+            scored = []
+            for object_uuid, counts, length in documents:
+                score = 0.0
+                for term in terms:
+                    if counts[term]:
+                        idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+                        score += idf * counts[term] * 2.2 / (counts[term] + 1.2 * (0.25 + 0.75 * length / average_length))
+                if score > 0:
+                    scored.append((score, object_uuid))
+            scored.sort(reverse=True)
+            objects = [
+                self._object(object_uuid, include_vector, return_properties, MetadataReturn(score=score))
+                for score, object_uuid in scored[:limit]
+            ]
+        return QueryReturn(objects=objects)
+
+    def insert_many(self, objects) -> BatchObjectReturn:
+        result = BatchObjectReturn()
+        for index, data_object in enumerate(objects):
+            object_uuid = self.put(data_object.properties, data_object.uuid, data_object.vector)
+            result.uuids[index] = uuid_module.UUID(object_uuid)
+        return result
+
+
+class FakeWeaviate:
+    """In-process stand-in for a Weaviate cluster, shared by the fake clients.
+
+    Every client call waits `latency` seconds (the network round trip) before
+    the fake server answers; async clients run the query on the server's own
+    threads, so the event loop stays free meanwhile like with a real cluster.
+    """
+
+    def __init__(self, latency: float = 0.0, dimensions: int = 1536, workers: int = 4):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.collections = {}
+        self.calls = Counter()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fake-weaviate")
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> FakeCollection:
+        """Return a collection, creating it on first use."""
+        with self._lock:
+            collection = self.collections.get(name)
+            if collection is None:
+                collection = self.collections[name] = FakeCollection(name, self.dimensions)
+            return collection
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self.collections.pop(name, None)
+
+
+class _Namespace:
+    """Routes the calls of one client namespace (query, data, ...) through the client."""
+
+    def __init__(self, client, collection_name: str):
+        self._client = client
+        self._name = collection_name
+
+    def _call(self, operation: str, fn):
+        return self._client._call(operation, lambda: fn(self._client.store.collection(self._name)))
+
+
+class _Query(_Namespace):
+    def fetch_objects(self, **kwargs):
+        return self._call("fetch_objects", lambda collection: collection.fetch_objects(**kwargs))
+
+    def fetch_object_by_id(self, uuid, **kwargs):
+        return self._call("fetch_object_by_id", lambda collection: collection.fetch_object_by_id(uuid, **kwargs))
+
+    def near_vector(self, near_vector, **kwargs):
+        return self._call("near_vector", lambda collection: collection.near_vector(near_vector, **kwargs))
+
+    def bm25(self, query, **kwargs):
+        return self._call("bm25", lambda collection: collection.bm25(query, **kwargs))
+
+
+class _Data(_Namespace):
+    def insert(self, properties, uuid=None, vector=None, **kwargs):
+        return self._call("insert", lambda collection: uuid_module.UUID(collection.put(properties, uuid, vector)))
+
+    def insert_many(self, objects):
+        return self._call("insert_many", lambda collection: collection.insert_many(objects))
+
+    def delete_many(self, where, **kwargs):
+        return self._call("delete_many", lambda collection: collection.delete(where))
+
+    def delete_by_id(self, uuid):
+        return self._call("delete_by_id", lambda collection: collection.delete(Filter.by_id().equal(uuid)) > 0)
+
+
+class _Aggregate(_Namespace):
+    def over_all(self, total_count: bool = True, **kwargs):
+        return self._call("aggregate", lambda collection: AggregateReturn(properties={}, total_count=len(collection)))
+
+
+class _BatchContext:
+    def __init__(self, batch):
+        self._batch = batch
+        self._pending = []
+
+    def add_object(self, properties, uuid=None, vector=None, **kwargs):
+        self._pending.append(BatchObject(
+            collection=self._batch._name, properties=properties, uuid=uuid, vector=vector, index=len(self._pending)
+        ))
+        if len(self._pending) >= BATCH_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            self._batch._call("batch", lambda collection: [collection.put(o.properties, o.uuid, o.vector) for o in pending])
+
+    @property
+    def number_errors(self) -> int:
+        return len(self._batch.failed_objects)
+
+
+class _Batch(_Namespace):
+    """Blocking batch import; objects are sent in rounds of BATCH_FLUSH_SIZE."""
+
+    def __init__(self, client, collection_name: str):
+        super().__init__(client, collection_name)
+        self.failed_objects = []
+
+    @contextmanager
+    def dynamic(self):
+        self.failed_objects = []
+        context = _BatchContext(self)
+        yield context
+        context.flush()
+
+    def fixed_size(self, batch_size: int = BATCH_FLUSH_SIZE, **kwargs):
+        return self.dynamic()
+
+    def rate_limit(self, requests_per_minute: int, **kwargs):
+        return self.dynamic()
+
+
+class _CollectionHandle:
+    def __init__(self, client, name: str):
+        self.name = name
+        self.query = _Query(client, name)
+        self.data = _Data(client, name)
+        self.aggregate = _Aggregate(client, name)
+        if isinstance(client, FakeWeaviateClient):
+            self.batch = _Batch(client, name)
+
+
+class _Collections:
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, name: str) -> _CollectionHandle:
+        return _CollectionHandle(self._client, name)
+
+    def create(self, name: str, **kwargs):
+        def create_collection():
+            self._client.store.collection(name)
+            return self.get(name)
+        return self._client._call("create", create_collection)
+
+    def delete(self, name: str):
+        return self._client._call("delete", lambda: self._client.store.delete_collection(name))
+
+    def exists(self, name: str):
+        return self._client._call("exists", lambda: name in self._client.store.collections)
+
+
+class FakeWeaviateClient:
+    """Blocking client of a FakeWeaviate (what weaviate.connect_to_wcs returns)."""
+
+    def __init__(self, store: FakeWeaviate):
+        self.store = store
+        self.collections = _Collections(self)
+        self._connected = True
+
+    def _call(self, operation: str, fn):
+        self.store.calls[operation] += 1
+        if self.store.latency:
+            time.sleep(self.store.latency)
+        return fn()
+
+    def connect(self):
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_ready(self) -> bool:
+        return self._connected
+
+    def close(self):
+        self._connected = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeWeaviateAsyncClient:
+    """Async client of a FakeWeaviate (what weaviate.use_async_with_weaviate_cloud returns)."""
+
+    def __init__(self, store: FakeWeaviate):
+        self.store = store
+        self.collections = _Collections(self)
+        self._connected = False
+
+    async def _call(self, operation: str, fn):
+        self.store.calls[operation] += 1
+        if self.store.latency:
+            await asyncio.sleep(self.store.latency)
+        return await asyncio.get_running_loop().run_in_executor(self.store.executor, fn)
+
+    async def connect(self):
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_ready(self) -> bool:
+        return self._connected
+
+    async def close(self):
+        self._connected = False
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def install(store: FakeWeaviate):
+    """Point weaviate.connect_to_wcs and weaviate.use_async_with_weaviate_cloud at `store`.
+
+    Must run before the app or the import script connect; they look the
+    functions up on the weaviate module at call time.
+    """
+    weaviate.connect_to_wcs = lambda *args, **kwargs: FakeWeaviateClient(store)
+    weaviate.use_async_with_weaviate_cloud = lambda *args, **kwargs: FakeWeaviateAsyncClient(store)
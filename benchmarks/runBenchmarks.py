@@ -0,0 +1,477 @@
+"""Offline load tests of the web app and the import against local stand-ins.
+
+    python benchmarks/runBenchmarks.py                              # every scenario at 1k, 10k and 100k issues
+    python benchmarks/runBenchmarks.py --scenarios graph ws --sizes 1000 10000
+    python benchmarks/runBenchmarks.py --output baseline.json
+    python benchmarks/runBenchmarks.py --baseline baseline.json     # exits with 1 on regressions
+
+Weaviate is replaced by the in-process FakeWeaviate (fakeWeaviate.py) and
+OpenAI by the FakeOpenAI HTTP server (fakeOpenAI.py), both with configurable
+latency, so no credentials or network access are needed. The app is driven
+in-process through its ASGI interface. Each scenario and size runs in a fresh
+process with its own data directory, so caches and peak RSS do not carry over
+between them.
+
+Scenarios:
+  graph   /graph-data: the first (cold) request that fits the layout, full
+          payloads (JSON and binary), and viewport/filter views
+  issue   /issue/{id} for random issues
+  ws      concurrent /ws/{id} chats: a suggested reply, then questions
+  import  import.py's load_data_to_weaviate with synthetic issues; the
+          throughput is issues/s and the latencies are per chunk of
+          IMPORT_CHECKPOINT_EVERY issues. Scoring is bound by the OpenAI
+          latency: at the defaults 100k issues take most of an hour, so
+          raise URGENCY_CONCURRENCY / URGENCY_BATCH_SIZE or lower
+          --openai-latency for quicker runs
+
+Reported per row: requests, errors, throughput (per second), p50/p99 latency,
+and the peak RSS of the process before the load (fakes seeded, modules
+imported) and after it. Peak RSS includes the fake Weaviate data but not the
+projection worker processes.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+SCENARIOS = ("graph", "issue", "ws", "import")
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Dimensions the mirror and the import's vector cache use for client-side embeddings
+EMBEDDING_DIMENSIONS = 1536
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(name: str, size: int, latencies, errors: int, seconds: float, start_rss: float, count: int = None) -> dict:
+    """One result row; `count` defaults to the number of successful requests."""
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000
+    count = len(latencies) if count is None else count
+    return {
+        "scenario": name,
+        "size": size,
+        "requests": count,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(count / seconds, 2) if seconds > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+        "start_rss_mb": round(start_rss, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+async def run_load(request, total: int, concurrency: int):
+    """Call `request(index)` `total` times from `concurrency` workers.
+
+    Returns the latencies of the successful calls, the number of failed
+    calls and the wall-clock seconds of the whole run.
+    """
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                await request(index)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"Request {index} failed: {e!r}")
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+class AsgiWebSocket:
+    """Minimal websocket client that talks to an ASGI app in-process."""
+
+    def __init__(self, app, path: str):
+        path, _, query = path.partition("?")
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "http_version": "1.1",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"benchmark")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("benchmark", 80),
+            "subprotocols": [],
+            "state": {}
+        }
+        self._app = app
+        self._to_app = asyncio.Queue()
+        self._from_app = asyncio.Queue()
+        self._task = None
+
+    async def _receive(self) -> dict:
+        if not self._from_app.empty():
+            return self._from_app.get_nowait()
+        message = asyncio.ensure_future(self._from_app.get())
+        await asyncio.wait({message, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if message.done():
+            return message.result()
+        message.cancel()
+        self._task.result()
+        raise ConnectionError("The websocket handler returned")
+
+    async def connect(self):
+        self._task = asyncio.create_task(self._app(self.scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._receive()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"Websocket was not accepted: {message}")
+
+    async def send_text(self, text: str):
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def receive_json(self) -> dict:
+        message = await self._receive()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"Websocket closed with code {message.get('code')}")
+        return json.loads(message["text"])
+
+    async def close(self):
+        if not self._task.done():
+            await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        await self._task
+
+
+@asynccontextmanager
+async def serve_app(data_dir: str):
+    """Run the app's lifespan and yield it with an HTTP client bound to it; saves /metrics at the end."""
+    import httpx
+    app = importlib.import_module("app").app
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+            yield app, client
+            response = await client.get("/metrics")
+            with open(os.path.join(data_dir, "metrics.prom"), "w") as f:
+                f.write(response.text)
+
+
+async def graph_scenario(store, size: int, args) -> list:
+    async with serve_app(args.data_dir) as (app, client):
+        start_rss = peak_rss_mb()
+        start = time.perf_counter()
+        response = await client.get("/graph-data", params={"format": "json"})
+        response.raise_for_status()
+        cold = time.perf_counter() - start
+        results = [summarize("graph-data cold", size, [cold], 0, cold, start_rss)]
+        layout = response.json()
+        x_min, x_max, y_min, y_max = min(layout["x"]), max(layout["x"]), min(layout["y"]), max(layout["y"])
+
+        async def full(index):
+            params = {"format": "json" if index % 2 else "binary"}
+            response = await client.get("/graph-data", params=params, headers={"Accept-Encoding": "gzip"})
+            response.raise_for_status()
+
+        results.append(summarize("graph-data full", size, *await run_load(full, args.requests, args.concurrency), start_rss))
+
+        rng = random.Random(args.seed)
+
+        async def view(index):
+            # Zoom levels from the whole layout down to a tenth of it, some with filters
+            scale = rng.choice((1.0, 0.5, 0.1))
+            width, height = (x_max - x_min) * scale, (y_max - y_min) * scale
+            left = x_min + rng.random() * (x_max - x_min - width)
+            bottom = y_min + rng.random() * (y_max - y_min - height)
+            params = {"format": "binary", "x_min": left, "x_max": left + width, "y_min": bottom, "y_max": bottom + height}
+            if index % 4 == 0:
+                params["state"] = "open"
+            if index % 8 == 0:
+                params["label"] = "bug"
+            response = await client.get("/graph-data", params=params, headers={"Accept-Encoding": "gzip"})
+            response.raise_for_status()
+
+        results.append(summarize("graph-data view", size, *await run_load(view, args.requests, args.concurrency), start_rss))
+    return results
+
+
+async def issue_scenario(store, size: int, args) -> list:
+    rng = random.Random(args.seed)
+    issue_ids = [str(rng.randrange(size)) for _ in range(args.requests)]
+    async with serve_app(args.data_dir) as (app, client):
+        start_rss = peak_rss_mb()
+
+        async def issue(index):
+            response = await client.get(f"/issue/{issue_ids[index]}")
+            response.raise_for_status()
+
+        return [summarize("issue", size, *await run_load(issue, args.requests, args.concurrency), start_rss)]
+
+
+async def ws_scenario(store, size: int, args) -> list:
+    rng = random.Random(args.seed)
+    first_frames = []
+    replies = []
+
+    async def reply(websocket, text: str, frame_type: str):
+        start = time.perf_counter()
+        first = None
+        await websocket.send_text(text)
+        while True:
+            frame = await websocket.receive_json()
+            if frame["type"] == "error":
+                raise RuntimeError(frame["data"])
+            if frame["type"] != frame_type:
+                continue
+            if first is None and frame["data"]:
+                first = time.perf_counter() - start
+            if frame["done"]:
+                break
+        replies.append(time.perf_counter() - start)
+        first_frames.append(first if first is not None else replies[-1])
+
+    async with serve_app(args.data_dir) as (app, client):
+        start_rss = peak_rss_mb()
+
+        async def session(index):
+            websocket = AsgiWebSocket(app, f"/ws/{rng.randrange(size)}")
+            await websocket.connect()
+            try:
+                for _ in range(2):
+                    frame = await websocket.receive_json()
+                    if frame["type"] == "error":
+                        raise RuntimeError(frame["data"])
+                await reply(websocket, "suggested_reply", "suggested_reply")
+                for message in range(1, args.messages):
+                    await reply(websocket, f"Question {message}: how do I reproduce this?", "reply")
+            finally:
+                await websocket.close()
+
+        _, errors, seconds = await run_load(session, args.sessions, args.sessions)
+    return [
+        summarize("ws first frame", size, first_frames, errors, seconds, start_rss),
+        summarize("ws reply", size, replies, errors, seconds, start_rss)
+    ]
+
+
+def import_scenario(store, size: int, args) -> list:
+    from syntheticData import synthetic_issues
+    importer = importlib.import_module("import")
+    importer.clear_data()
+    importer.create_collection()
+    importer.create_solved_collection()
+    issues = synthetic_issues(size, seed=args.seed, urgency=False)
+    start_rss = peak_rss_mb()
+
+    chunk_seconds = []
+    import_chunk = importer.import_chunk
+
+    def timed_import_chunk(*chunk_args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return import_chunk(*chunk_args, **kwargs)
+        finally:
+            chunk_seconds.append(time.perf_counter() - start)
+
+    importer.import_chunk = timed_import_chunk
+    start = time.perf_counter()
+    importer.load_data_to_weaviate(issues, {}, args.embed_locally)
+    seconds = time.perf_counter() - start
+    errors = size - len(store.collection("GithubIssues"))
+    return [summarize("import", size, chunk_seconds, errors, seconds, start_rss, count=size)]
+
+
+SCENARIO_FUNCTIONS = {
+    "graph": graph_scenario,
+    "issue": issue_scenario,
+    "ws": ws_scenario,
+    "import": import_scenario,
+}
+
+
+def configure_environment(args):
+    """Settings of the app and the import for one run, all files inside the run's data directory."""
+    data_dir = args.data_dir
+    os.environ.update({
+        "WCS_URL": "http://fake-weaviate.invalid",
+        "WCS_API_KEY": "benchmark",
+        "OPENAI_API_KEY": "benchmark",
+        "LAYOUT_CACHE_DIR": data_dir,
+        "VECTOR_MIRROR_DIR": os.path.join(data_dir, "mirror"),
+        "COLLECTION_VERSION_DIR": data_dir,
+        "VECTOR_DIMENSIONS": str(args.dimensions),
+        "CHAT_SESSION_DB": os.path.join(data_dir, "chat_sessions.sqlite"),
+        "IMPORT_CHECKPOINT_PATH": os.path.join(data_dir, "import_checkpoint.json"),
+        "URGENCY_CACHE_PATH": os.path.join(data_dir, "urgency_cache.json"),
+        "VECTOR_CACHE_PATH": os.path.join(data_dir, "vector_cache"),
+        "IMPORT_EMBEDDING_MODE_PATH": os.path.join(data_dir, "import_embedding_mode.json"),
+        "IMPORT_METRICS_PATH": os.path.join(data_dir, "import_metrics.prom"),
+        "PROFILE_DIR": os.path.join(data_dir, "profiles"),
+        "PROJECTION_ENGINE": args.engine,
+        # The account's rate limits would dominate the import; the fake server has none
+        "URGENCY_RPM": "100000000",
+        "URGENCY_TPM": "100000000000",
+    })
+    os.environ.pop("COMPLETION_CACHE_DB", None)
+
+
+def run_child(args):
+    """Run one scenario at one size in this process and write its rows to <data dir>/results.json."""
+    scenario, size = args.child[0], int(args.child[1])
+    configure_environment(args)
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(REPO_DIR)
+    from fakeOpenAI import FakeOpenAI
+    from fakeWeaviate import FakeWeaviate, install
+    from syntheticData import synthetic_issues
+
+    openai_server = FakeOpenAI(args.openai_latency, args.token_interval, args.reply_tokens, args.dimensions)
+    os.environ["OPENAI_BASE_URL"] = openai_server.start()
+    store = FakeWeaviate(args.weaviate_latency, args.dimensions)
+    install(store)
+    if scenario != "import":
+        store.collection("GithubIssues").put_many(synthetic_issues(size, seed=args.seed))
+        solved = synthetic_issues(max(1, size // 10), seed=args.seed + 1, start=size, state="closed")
+        store.collection("Solved").put_many(solved)
+
+    try:
+        run = SCENARIO_FUNCTIONS[scenario]
+        results = asyncio.run(run(store, size, args)) if asyncio.iscoroutinefunction(run) else run(store, size, args)
+    finally:
+        openai_server.stop()
+    for row in results:
+        row["weaviate_calls"] = sum(store.calls.values())
+        row["openai_requests"] = sum(openai_server.requests.values())
+    with open(os.path.join(args.data_dir, "results.json"), "w") as f:
+        json.dump(results, f)
+
+
+def run_in_subprocess(scenario: str, size: int, args) -> list:
+    data_dir = tempfile.mkdtemp(prefix=f"benchmark-{scenario}-{size}-")
+    log_path = os.path.join(data_dir, "benchmark.log")
+    command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--child", scenario, str(size), "--data-dir", data_dir]
+    with open(log_path, "w") as log:
+        returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+    if returncode != 0:
+        with open(log_path) as log:
+            print("".join(log.readlines()[-20:]))
+        print(f"{scenario} with {size} issues failed (exit code {returncode}), output kept in {data_dir}")
+        return []
+    with open(os.path.join(data_dir, "results.json")) as f:
+        results = json.load(f)
+    if args.keep_data:
+        print(f"Output, metrics and log kept in {data_dir}")
+    else:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def print_table(results: list):
+    columns = (
+        ("scenario", "scenario", 16), ("size", "size", 7), ("requests", "requests", 8), ("errors", "errors", 6),
+        ("throughput", "per s", 9), ("p50_ms", "p50 ms", 9), ("p99_ms", "p99 ms", 9),
+        ("start_rss_mb", "start MB", 9), ("peak_rss_mb", "peak MB", 9)
+    )
+    print("  ".join(title.rjust(width) if key != "scenario" else title.ljust(width) for key, title, width in columns))
+    for row in results:
+        cells = []
+        for key, _, width in columns:
+            value = "-" if row[key] is None else str(row[key])
+            cells.append(value.ljust(width) if key == "scenario" else value.rjust(width))
+        print("  ".join(cells))
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Rows whose throughput dropped or whose p99 latency or peak RSS grew by more than `tolerance`."""
+    previous = {(row["scenario"], row["size"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        before = previous.get((row["scenario"], row["size"]))
+        if before is None:
+            continue
+        checks = (
+            ("throughput", lambda old, new: new < old * (1 - tolerance)),
+            ("p99_ms", lambda old, new: new > old * (1 + tolerance)),
+            ("peak_rss_mb", lambda old, new: new > old * (1 + tolerance)),
+        )
+        for metric, worse in checks:
+            if before.get(metric) is not None and row[metric] is not None and worse(before[metric], row[metric]):
+                regressions.append(f"{row['scenario']} at {row['size']} issues: {metric} {before[metric]} -> {row[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load tests of the web app and the import.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="synthetic issues in the collection")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests per graph-data and issue row")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent websocket chats")
+    parser.add_argument("--messages", type=int, default=3, help="messages per chat, the first one asks for a suggested reply")
+    parser.add_argument("--engine", default="pca", help="projection engine of the graph layout (t-SNE takes minutes at 100k)")
+    parser.add_argument("--dimensions", type=int, default=256, help="vector dimensions of the synthetic issues")
+    parser.add_argument("--weaviate-latency", type=float, default=0.005, help="seconds per Weaviate round trip")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds until OpenAI's first token or answer")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="tokens per streamed reply")
+    parser.add_argument("--embed-locally", action="store_true", help="import with client-side embeddings (needs --dimensions 1536)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON, e.g. to use as a baseline later")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="relative change that counts as a regression (p99 of short runs is noisy)")
+    parser.add_argument("--keep-data", action="store_true", help="keep each run's data directory (log, metrics.prom, caches)")
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.embed_locally and args.dimensions != EMBEDDING_DIMENSIONS:
+        parser.error(f"--embed-locally imports {EMBEDDING_DIMENSIONS}-dimensional embeddings, use --dimensions {EMBEDDING_DIMENSIONS}")
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            print(f"Running {scenario} with {size} issues...", flush=True)
+            results.extend(run_in_subprocess(scenario, size, args))
+    print()
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"options": {key: value for key, value in vars(args).items() if key not in ("child", "data_dir", "output", "baseline")}, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print()
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import zlib
+import numpy as np
+
+# Topics the synthetic issues are drawn from; words of one topic end up close in vector space
+TOPICS = (
+    ("login", "oauth", "token", "session", "password", "sso"),
+    ("crash", "segfault", "panic", "stacktrace", "abort", "core"),
+    ("build", "compile", "linker", "cmake", "toolchain", "wheel"),
+    ("docs", "typo", "readme", "example", "tutorial", "docstring"),
+    ("memory", "leak", "allocation", "oom", "heap", "gc"),
+    ("slow", "latency", "performance", "timeout", "regression", "benchmark"),
+    ("ui", "button", "layout", "css", "dark", "theme"),
+    ("api", "endpoint", "json", "schema", "pagination", "rest"),
+    ("database", "migration", "query", "index", "postgres", "sqlite"),
+    ("test", "flaky", "ci", "coverage", "fixture", "mock"),
+    ("install", "dependency", "version", "pip", "conda", "upgrade"),
+    ("network", "proxy", "dns", "tls", "socket", "retry"),
+)
+COMMON_WORDS = ("the", "when", "after", "fails", "with", "error", "on", "in", "using", "support", "add", "fix", "broken", "new")
+REPOS = ("acme/server", "acme/client", "acme/docs", "acme/cli", "acme/plugins")
+LABELS = ("bug", "enhancement", "question", "documentation", "help wanted", "good first issue")
+USERS = tuple(f"user{i}" for i in range(200))
+
+_word_vectors = {}
+
+
+def _word_vector(word: str, dimensions: int) -> np.ndarray:
+    key = (word, dimensions)
+    vector = _word_vectors.get(key)
+    if vector is None:
+        vector = np.random.default_rng(zlib.crc32(word.encode("utf-8"))).standard_normal(dimensions).astype(np.float32)
+        _word_vectors[key] = vector
+    return vector
+
+
+def text_vector(text: str, dimensions: int) -> np.ndarray:
+    """Deterministic unit vector of a text: the normalized sum of its word vectors.
+
+    Texts sharing words are close to each other, which is enough for
+    projections, clustering and nearest-neighbour lookups to behave like they
+    do on real embeddings.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in text.lower().split():
+        vector += _word_vector(word, dimensions)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector = _word_vector("", dimensions).copy()
+        norm = np.linalg.norm(vector)
+    return vector / norm
+
+
+def synthetic_issues(count: int, seed: int = 0, start: int = 0, state: str = None, urgency: bool = True) -> list:
+    """Issue properties in the shape import.prepare_issues produces.
+
+    Issue ids are `str(start + i)`; with `urgency` each issue also gets a
+    score like the import would have stored.
+    """
+    rng = np.random.default_rng(seed)
+    issues = []
+    for i in range(count):
+        topic = TOPICS[rng.integers(len(TOPICS))]
+        title_words = list(rng.choice(topic, size=rng.integers(2, 5))) + list(rng.choice(COMMON_WORDS, size=rng.integers(2, 6)))
+        rng.shuffle(title_words)
+        body_words = rng.choice(topic + COMMON_WORDS, size=rng.integers(30, 150))
+        issue_id = str(start + i)
+        repo_name = REPOS[rng.integers(len(REPOS))]
+        day = 1 + int(rng.integers(28))
+        properties = {
+            "issue_id": issue_id,
+            "title": " ".join(title_words),
+            "body": " ".join(body_words),
+            "type": "pull request" if rng.random() < 0.3 else "issue",
+            "repo_name": repo_name,
+            "state": state or ("open" if rng.random() < 0.6 else "closed"),
+            "created": f"2024-01-{day:02d}T12:00:00Z",
+            "updated": f"2024-02-{day:02d}T12:00:00Z",
+            "user_login": USERS[rng.integers(len(USERS))],
+            "url": f"https://github.com/{repo_name}/issues/{issue_id}",
+            "comments": int(rng.integers(20)),
+            "user_type": "User",
+            "labels": [str(label) for label in rng.choice(LABELS, size=rng.integers(3), replace=False)],
+            "assignees": [USERS[rng.integers(len(USERS))]] if rng.random() < 0.4 else []
+        }
+        if urgency:
+            properties["urgency"] = str(1 + int(rng.integers(4)))
+        issues.append(properties)
+    return issues
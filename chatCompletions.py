@@ -1,39 +1,101 @@
-import openai
-from openai import OpenAI
+import asyncio
 import os
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
-from typing import Generator
+from typing import AsyncGenerator
+from conversationContext import compact_conversation, count_tokens, message_tokens, MODEL, CONTEXT_TOKEN_BUDGET
+from metrics import counter, histogram
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialisiere Gesprächsverlauf
-conversation = [{"role": "system", "content": "you are a helpful assistant."}]
-message_buffer = []
+# Seconds a single completion may take in total before it is cut off
+COMPLETION_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+# Maximum number of completions streaming at the same time in this process
+MAX_CONCURRENT_COMPLETIONS = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+# Last chunk of every reply, and the text sent instead of the rest of a reply that timed out
+FINISHED = "__message_finished__"
+TIMEOUT_NOTICE = " [The response timed out.]"
 
+COMPLETIONS = counter("openai_completions_total", "Chat completions by outcome.", ["outcome"])
+COMPLETION_TOKENS = counter("openai_completion_tokens_total", "Tokens streamed by chat completions (estimated without tiktoken).")
+TIME_TO_FIRST_TOKEN = histogram("openai_time_to_first_token_seconds", "Seconds from the request to the first streamed token.")
+TOKENS_PER_SECOND = histogram(
+    "openai_tokens_per_second", "Streaming speed of a completion after its first token.",
+    buckets=(5, 10, 20, 30, 40, 60, 80, 100, 150, 200)
+)
 
-async def get_results(prompt: str, conversation: list) -> Generator: # type: ignore
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=COMPLETION_TIMEOUT)
+completion_slots = asyncio.Semaphore(MAX_CONCURRENT_COMPLETIONS)
+
+
+async def get_results(prompt: str, conversation: list, context: str = None) -> AsyncGenerator[str, None]:
+    """Stream the assistant's reply to `prompt` chunk by chunk.
+
+    Runs on the async OpenAI client, so other websockets and requests keep
+    being served while a completion streams. When the consumer stops early
+    (e.g. the websocket disconnected) the upstream stream is closed and its
+    concurrency slot released. `context` (e.g. retrieved similar issues) is
+    sent right before the prompt for this request only; it is not added to
+    the conversation.
+    """
     message_buffer = []
     conversation.append({"role": "user", "content": prompt})
+    extra = [{"role": "user", "content": context}] if context else []
 
-    # Kürzen Sie das Array auf die letzten 20 Elemente, falls nötig
-    if len(conversation) > 20:
-        conversation = conversation[-20:]
-
-    response = openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=conversation,
-        temperature=0.8,
-        stream=True
-    )
+    # Keep the prompt within the token budget; this shrinks the caller's list in place
+    compact_conversation(conversation, CONTEXT_TOKEN_BUDGET - sum(message_tokens(message) for message in extra))
+    messages = conversation[:-1] + extra + conversation[-1:]
 
-    for chunk in response:
-        if chunk.choices[0].delta.content is not None:
-            chunk_content = chunk.choices[0].delta.content
-            message_buffer.append(chunk_content)
-            yield chunk_content
+    outcome = "error"
+    async with completion_slots:
+        started = asyncio.get_running_loop().time()
+        first_token = None
+        deadline = started + COMPLETION_TIMEOUT
+        try:
+            async with asyncio.timeout_at(deadline):
+                response = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0.8,
+                    stream=True
+                )
+            try:
+                chunks = aiter(response)
+                while True:
+                    # The deadline covers the whole completion, not only the first byte
+                    async with asyncio.timeout_at(deadline):
+                        chunk = await anext(chunks, None)
+                    if chunk is None:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        chunk_content = chunk.choices[0].delta.content
+                        if first_token is None:
+                            first_token = asyncio.get_running_loop().time()
+                            TIME_TO_FIRST_TOKEN.observe(first_token - started)
+                        message_buffer.append(chunk_content)
+                        yield chunk_content
+                outcome = "ok"
+            finally:
+                await response.close()
+        except TimeoutError:
+            outcome = "timeout"
+            print(f"Completion timed out after {COMPLETION_TIMEOUT} seconds.")
+            message_buffer.append(TIMEOUT_NOTICE)
+            yield TIMEOUT_NOTICE
+        except (GeneratorExit, asyncio.CancelledError):
+            outcome = "abandoned"
+            raise
+        finally:
+            COMPLETIONS.inc(outcome=outcome)
+            if first_token is not None:
+                streamed = message_buffer[:-1] if outcome == "timeout" else message_buffer
+                tokens = count_tokens("".join(streamed))
+                COMPLETION_TOKENS.inc(tokens)
+                elapsed = asyncio.get_running_loop().time() - first_token
+                if elapsed > 0:
+                    TOKENS_PER_SECOND.observe(tokens / elapsed)
 
     complete_message = "".join(message_buffer)
-    yield "__message_finished__"
+    yield FINISHED
     conversation.append({"role": "assistant", "content": complete_message})
-    print([message['content'] for message in conversation])
\ No newline at end of file
+    print([message['content'] for message in conversation])
@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# SQLite file that keeps chat sessions across restarts and shares them between workers
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "data/chat_sessions.sqlite")
+# Sessions kept in memory, and the memory their messages may take in total
+CHAT_SESSION_CACHE_SIZE = int(os.getenv("CHAT_SESSION_CACHE_SIZE", "1000"))
+CHAT_SESSION_MEMORY_BYTES = int(os.getenv("CHAT_SESSION_MEMORY_MB", "64")) * 1024 * 1024
+# Seconds an idle session stays in memory, and days it is kept on disk
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_SESSION_RETENTION_DAYS = float(os.getenv("CHAT_SESSION_RETENTION_DAYS", "30"))
+# Prompts of a suggested reply: its instructions (stored with the similar issues by older sessions) and the prompt
+SUGGESTED_REPLY_PROMPT = "Write a suggested reply to solve the issue. Start directly with the reply!"
+SUGGESTION_PROMPT = "Provide a suggested solution to fix the issue."
+
+
+class ChatSession:
+    """The conversation of one chat about an issue."""
+
+    def __init__(self, session_id: str, issue_id: str, issue_hash: str, conversation: list, updated: float = None):
+        self.id = session_id
+        self.issue_id = issue_id
+        self.issue_hash = issue_hash
+        self.conversation = conversation
+        self.updated = updated or time.time()
+
+    def size(self) -> int:
+        """Approximate memory taken by the messages, in bytes."""
+        return sum(len(message["content"] or "") for message in self.conversation)
+
+    def history(self) -> list:
+        """The user and assistant messages, without the system context.
+
+        The prompts of a suggested reply are left out and the reply itself is
+        marked with "suggested": True, so it is not shown as a chat turn.
+        """
+        history = []
+        suggested = False
+        for message in self.conversation:
+            if message["role"] == "user":
+                suggested = (message["content"] or "").startswith((SUGGESTED_REPLY_PROMPT, SUGGESTION_PROMPT))
+                if not suggested:
+                    history.append(message)
+            elif message["role"] == "assistant":
+                history.append(dict(message, suggested=True) if suggested else message)
+                suggested = False
+        return history
+
+
+class ChatSessionStore:
+    """Chat sessions in a bounded in-memory LRU, written through to SQLite.
+
+    Memory holds the recently used sessions, limited by count, total message
+    size and idle time; sessions evicted from memory stay on disk and are
+    loaded again when they are resumed. Every save goes to disk, so other
+    workers see the latest version: a session in memory is reloaded if the
+    disk copy is newer.
+    """
+
+    def __init__(self, db_path: str = CHAT_SESSION_DB, maxsize: int = CHAT_SESSION_CACHE_SIZE,
+                 max_bytes: int = CHAT_SESSION_MEMORY_BYTES, ttl: float = CHAT_SESSION_TTL,
+                 retention_days: float = CHAT_SESSION_RETENTION_DAYS):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.retention = retention_days * 86400
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db_ready = False
+
+    def _connect(self):
+        if not self._db_ready:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        if not self._db_ready:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "id TEXT PRIMARY KEY, issue_id TEXT NOT NULL, issue_hash TEXT NOT NULL, "
+                "conversation TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db_ready = True
+        return connection
+
+    def _remember(self, session: ChatSession):
+        with self._lock:
+            previous = self._sessions.pop(session.id, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            size = session.size()
+            self._sessions[session.id] = (session, size, time.monotonic())
+            self._bytes += size
+            # Evict least recently used sessions beyond the limits, but never the one just stored
+            while len(self._sessions) > 1 and (len(self._sessions) > self.maxsize or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._sessions.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _cached(self, session_id: str):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            session, size, used = item
+            if used + self.ttl < time.monotonic():
+                del self._sessions[session_id]
+                self._bytes -= size
+                return None
+            self._sessions[session_id] = (session, size, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self, issue_id: str, issue_hash: str, conversation: list) -> ChatSession:
+        """Start a new session and persist it."""
+        session = ChatSession(uuid.uuid4().hex, issue_id, issue_hash, conversation)
+        self.save(session)
+        return session
+
+    def get(self, session_id: str):
+        """Return a session from memory or disk, or None if it does not exist."""
+        session = self._cached(session_id)
+        with self._db_lock, self._connect() as db:
+            if session is not None:
+                row = db.execute("SELECT updated FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+                if row is None or row[0] <= session.updated:
+                    return session
+            row = db.execute(
+                "SELECT issue_id, issue_hash, conversation, updated FROM chat_sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if session is not None:
+            # Another worker continued the conversation; update the list in place for its holders
+            session.conversation[:] = json.loads(row[2])
+            session.updated = row[3]
+        else:
+            session = ChatSession(session_id, row[0], row[1], json.loads(row[2]), row[3])
+        self._remember(session)
+        return session
+
+    def save(self, session: ChatSession):
+        """Write a session to disk and keep it in memory as the most recently used."""
+        session.updated = time.time()
+        conversation = json.dumps(session.conversation)
+        with self._db_lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO chat_sessions VALUES (?, ?, ?, ?, ?)",
+                (session.id, session.issue_id, session.issue_hash, conversation, session.updated)
+            )
+            db.execute("DELETE FROM chat_sessions WHERE updated < ?", (time.time() - self.retention,))
+        self._remember(session)
+
+
+chat_sessions = ChatSessionStore()
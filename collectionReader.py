@@ -0,0 +1,83 @@
+import os
+from weaviate.classes.query import Filter, Sort
+from metrics import histogram
+
+# Number of objects fetched per page when reading whole collections
+PAGE_SIZE = int(os.getenv("WEAVIATE_PAGE_SIZE", "500"))
+
+WEAVIATE_QUERY_SECONDS = histogram("weaviate_query_seconds", "Seconds per Weaviate page query.", ["operation"])
+
+
+def iter_pages(collection, batch_size: int = PAGE_SIZE, include_vector: bool = True, return_properties=None):
+    """Yield all objects of a collection in pages, following the uuid cursor.
+
+    Unlike a single `fetch_objects` call this is not capped by the server's
+    default query limit and only keeps one page in memory at a time.
+    """
+    after = None
+    operation = "fetch_page_with_vectors" if include_vector else "fetch_page"
+    while True:
+        with WEAVIATE_QUERY_SECONDS.time(operation=operation):
+            response = collection.query.fetch_objects(
+                limit=batch_size,
+                after=after,
+                include_vector=include_vector,
+                return_properties=return_properties
+            )
+        if not response.objects:
+            return
+        yield response.objects
+        if len(response.objects) < batch_size:
+            return
+        after = response.objects[-1].uuid
+
+
+async def aiter_pages(collection, batch_size: int = PAGE_SIZE, include_vector: bool = True, return_properties=None):
+    """Async version of `iter_pages` for collections of the async client."""
+    after = None
+    operation = "fetch_page_with_vectors" if include_vector else "fetch_page"
+    while True:
+        with WEAVIATE_QUERY_SECONDS.time(operation=operation):
+            response = await collection.query.fetch_objects(
+                limit=batch_size,
+                after=after,
+                include_vector=include_vector,
+                return_properties=return_properties
+            )
+        if not response.objects:
+            return
+        yield response.objects
+        if len(response.objects) < batch_size:
+            return
+        after = response.objects[-1].uuid
+
+
+async def aiter_filtered_pages(collection, filters, key: str = "issue_id", batch_size: int = PAGE_SIZE, return_properties=None):
+    """Yield the objects matching `filters` in pages, ordered by the unique property `key`.
+
+    The uuid cursor cannot be combined with filters and offsets are capped by
+    the server's QUERY_MAXIMUM_RESULTS, so each page asks for `key` greater
+    than the last one seen instead. Vectors are not fetched.
+    """
+    return_properties = list(return_properties or [key])
+    if key not in return_properties:
+        return_properties.append(key)
+    last = None
+    while True:
+        page_filters = Filter.by_property(key).greater_than(last) if last is not None else None
+        if filters is not None:
+            page_filters = filters if page_filters is None else filters & page_filters
+        with WEAVIATE_QUERY_SECONDS.time(operation="fetch_filtered_page"):
+            response = await collection.query.fetch_objects(
+                limit=batch_size,
+                filters=page_filters,
+                sort=Sort.by_property(key),
+                include_vector=False,
+                return_properties=return_properties
+            )
+        if not response.objects:
+            return
+        yield response.objects
+        if len(response.objects) < batch_size:
+            return
+        last = response.objects[-1].properties[key]
@@ -0,0 +1,36 @@
+import os
+import threading
+import uuid
+
+# One `<collection>.version` file per collection, shared by the web workers and import.py
+COLLECTION_VERSION_DIR = os.getenv("COLLECTION_VERSION_DIR", "data")
+
+
+def _version_path(collection_name: str) -> str:
+    return os.path.join(COLLECTION_VERSION_DIR, f"{collection_name}.version")
+
+
+def collection_version(collection_name: str):
+    """Return the token of the last recorded change to a collection, or None if none was recorded."""
+    try:
+        with open(_version_path(collection_name), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def bump_collection_version(collection_name: str) -> str:
+    """Record that a collection changed and return the new token.
+
+    Every writer (the import, the migration to Solved) calls this after its
+    write, so caches derived from the collection, like the graph layout,
+    know they have to sync again.
+    """
+    version = uuid.uuid4().hex
+    path = _version_path(collection_name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import AsyncGenerator
+from chatCompletions import get_results, FINISHED, TIMEOUT_NOTICE
+from conversationContext import MODEL
+from ttlCache import TTLCache
+from metrics import counter
+
+COMPLETION_CACHE_SIZE = int(os.getenv("COMPLETION_CACHE_SIZE", "512"))
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "3600"))
+# Optional SQLite file (e.g. data/completion_cache.sqlite) that keeps cached completions across restarts and workers
+COMPLETION_CACHE_DB = os.getenv("COMPLETION_CACHE_DB")
+
+COMPLETION_CACHE_REQUESTS = counter("completion_cache_requests_total", "Suggested replies by how they were served.", ["result"])
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def cache_key(model: str, issue_hash: str, conversation: list, prompt: str, context: str = None) -> str:
+    """Key of a completion: model, issue content, the whitespace-normalized conversation and the extra context."""
+    messages = [(message["role"], " ".join((message["content"] or "").split())) for message in conversation]
+    messages.append(("user", " ".join(prompt.split())))
+    return content_hash({"model": model, "issue": issue_hash, "messages": messages, "context": " ".join((context or "").split())})
+
+
+class CompletionInterrupted(Exception):
+    """The stream a request was following stopped before the reply was complete."""
+
+
+class DiskCompletionStore:
+    """SQLite table of cached completions with the same TTL and size bound as the memory cache."""
+
+    def __init__(self, path: str, maxsize: int, ttl: float):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, chunks TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT chunks FROM completions WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, chunks):
+        with self._lock, self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?)", (key, json.dumps(chunks), time.time() + self.ttl))
+            db.execute("DELETE FROM completions WHERE expires <= ?", (time.time(),))
+            db.execute(
+                "DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+
+class _InFlight:
+    """Chunks of a completion that is still streaming, shared with identical requests."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.failed = False
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk=None, done=False, failed=False):
+        async with self.changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            self.done = self.done or done
+            self.failed = self.failed or failed
+            self.changed.notify_all()
+
+
+class CompletionCache:
+    """Cache of streamed completions with replay and request coalescing.
+
+    A cached completion is replayed chunk by chunk, exactly as it was
+    streamed. While a completion is streaming, identical requests follow the
+    same stream instead of starting another upstream call. If that stream is
+    abandoned (its client went away), a follower that has not received
+    anything yet makes the request itself; one that has raises
+    CompletionInterrupted.
+    """
+
+    def __init__(self, maxsize: int = COMPLETION_CACHE_SIZE, ttl: float = COMPLETION_CACHE_TTL, db_path: str = COMPLETION_CACHE_DB):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = DiskCompletionStore(db_path, maxsize, ttl) if db_path else None
+        self._inflight = {}
+
+    async def _lookup(self, key):
+        chunks = self.memory.get(key)
+        if chunks is None and self.disk is not None:
+            chunks = await asyncio.to_thread(self.disk.get, key)
+            if chunks is not None:
+                self.memory.set(key, chunks)
+        return chunks
+
+    async def _store(self, key, chunks):
+        self.memory.set(key, chunks)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, chunks)
+
+    async def stream(self, prompt: str, conversation: list, issue_hash: str, context: str = None) -> AsyncGenerator[str, None]:
+        """Stream the reply to `prompt` like `get_results`, served from the cache when possible."""
+        key = cache_key(MODEL, issue_hash, conversation, prompt, context)
+
+        chunks = await self._lookup(key)
+        if chunks is None and key in self._inflight:
+            COMPLETION_CACHE_REQUESTS.inc(result="coalesced")
+            inflight = self._inflight[key]
+            chunks = []
+            async for chunk in self._follow(inflight):
+                chunks.append(chunk)
+                yield chunk
+            if not inflight.failed:
+                self._record(conversation, prompt, chunks)
+                yield FINISHED
+                return
+            if chunks:
+                # Part of the reply went out already; it is neither recorded nor cached
+                raise CompletionInterrupted("The suggested reply was interrupted, please request it again.")
+            # The stream we waited for was abandoned before it produced anything
+            chunks = None
+
+        if chunks is not None:
+            COMPLETION_CACHE_REQUESTS.inc(result="hit")
+            for chunk in chunks:
+                yield chunk
+            self._record(conversation, prompt, chunks)
+            yield FINISHED
+            return
+
+        COMPLETION_CACHE_REQUESTS.inc(result="miss")
+        async for chunk in self._lead(key, prompt, conversation, context):
+            yield chunk
+
+    async def _follow(self, inflight: _InFlight):
+        position = 0
+        while True:
+            async with inflight.changed:
+                await inflight.changed.wait_for(lambda: len(inflight.chunks) > position or inflight.done)
+                new_chunks = inflight.chunks[position:]
+                done = inflight.done
+            position += len(new_chunks)
+            for chunk in new_chunks:
+                yield chunk
+            if done:
+                return
+
+    async def _lead(self, key, prompt, conversation, context):
+        inflight = _InFlight()
+        self._inflight[key] = inflight
+        chunks = []
+        completed = False
+        try:
+            # Run get_results to the end: it records the reply in the conversation after FINISHED
+            async for chunk in get_results(prompt, conversation, context):
+                if chunk == FINISHED:
+                    completed = True
+                    continue
+                chunks.append(chunk)
+                await inflight.publish(chunk)
+                yield chunk
+        finally:
+            self._inflight.pop(key, None)
+            await inflight.publish(done=True, failed=not completed)
+        if chunks and chunks[-1] != TIMEOUT_NOTICE:
+            await self._store(key, chunks)
+        yield FINISHED
+
+    @staticmethod
+    def _record(conversation, prompt, chunks):
+        """Add the replayed exchange to the conversation, as `get_results` would have."""
+        conversation.append({"role": "user", "content": prompt})
+        conversation.append({"role": "assistant", "content": "".join(chunks)})
+
+
+completion_cache = CompletionCache()
@@ -0,0 +1,92 @@
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MODEL = "gpt-3.5-turbo"
+# Tokens the prompt (all messages) may use; the rest of the window is left for the reply
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Tokens of the issue body that go into the system message
+ISSUE_BODY_TOKEN_LIMIT = int(os.getenv("ISSUE_BODY_TOKEN_LIMIT", "800"))
+# Tokens reserved for the summary of dropped turns, and per dropped turn
+SUMMARY_TOKEN_LIMIT = 300
+SUMMARY_LINE_TOKENS = 40
+SUMMARY_PREFIX = "Summary of earlier messages in this conversation:"
+# Tokens the chat format adds per message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = MODEL):
+    """Return the (cached) tokenizer of a model, or None if tiktoken is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        print(f"Could not load tokenizer for {model}, estimating tokens instead: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = MODEL) -> int:
+    """Number of tokens in a text (about four characters per token without tiktoken)."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(message["content"] or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_tokens(text: str, limit: int, model: str = MODEL) -> str:
+    """Cut a text to at most `limit` tokens."""
+    text = text or ""
+    if count_tokens(text, model) <= limit:
+        return text
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:limit * 4].rsplit(" ", 1)[0] + " ..."
+    return encoding.decode(encoding.encode(text)[:limit]) + " ..."
+
+
+def is_summary(message: dict) -> bool:
+    return message["role"] == "system" and (message["content"] or "").startswith(SUMMARY_PREFIX)
+
+
+def compact_conversation(conversation: list, budget: int = CONTEXT_TOKEN_BUDGET) -> list:
+    """Shrink a conversation in place until it fits the token budget.
+
+    The leading system message (the issue context) is always kept, as is the
+    latest message. Older turns are dropped oldest first; each dropped turn
+    leaves a one-line gist in a running summary message right after the system
+    message, which itself is capped at SUMMARY_TOKEN_LIMIT tokens.
+    """
+    total = sum(message_tokens(message) for message in conversation)
+    if total <= budget:
+        return conversation
+
+    head = 1 if conversation and conversation[0]["role"] == "system" else 0
+    summary_lines = []
+    if len(conversation) > head and is_summary(conversation[head]):
+        summary = conversation.pop(head)
+        total -= message_tokens(summary)
+        summary_lines = summary["content"].splitlines()[1:]
+
+    # Drop the oldest turns until the rest fits next to the summary
+    while total > budget - SUMMARY_TOKEN_LIMIT and len(conversation) > head + 1:
+        dropped = conversation.pop(head)
+        total -= message_tokens(dropped)
+        gist = " ".join(truncate_tokens(dropped["content"], SUMMARY_LINE_TOKENS).split())
+        summary_lines.append(f"- {dropped['role']}: {gist}")
+
+    while summary_lines and count_tokens("\n".join([SUMMARY_PREFIX] + summary_lines)) > SUMMARY_TOKEN_LIMIT:
+        summary_lines.pop(0)
+    if summary_lines:
+        conversation.insert(head, {"role": "system", "content": "\n".join([SUMMARY_PREFIX] + summary_lines)})
+    return conversation
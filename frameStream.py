@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+from chatCompletions import FINISHED
+
+# Seconds text deltas are held back so they go out together in one frame
+FRAME_INTERVAL = float(os.getenv("WS_FRAME_INTERVAL", "0.05"))
+# A frame is sent right away once this many bytes of text are buffered
+FRAME_MAX_BYTES = int(os.getenv("WS_FRAME_MAX_BYTES", "4096"))
+# Seconds a client may take to accept a frame before it is dropped as too slow
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+_END = object()
+
+
+class SlowConsumer(Exception):
+    """The client did not accept a frame within the send timeout."""
+
+
+class FrameSender:
+    """Sends JSON frames {"type", "seq", "data", "done"} over a websocket.
+
+    Streamed text is coalesced: deltas are buffered for up to `interval`
+    seconds or `max_bytes` bytes and sent as one frame, the last frame of a
+    message carrying done=true. At most one frame is in flight; the next
+    delta is read from the source while it is being sent, and nothing more is
+    read until it went out. A client that does not accept a frame within
+    `send_timeout` seconds raises SlowConsumer.
+    """
+
+    def __init__(self, websocket, interval: float = FRAME_INTERVAL, max_bytes: int = FRAME_MAX_BYTES,
+                 send_timeout: float = SEND_TIMEOUT):
+        self.websocket = websocket
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.send_timeout = send_timeout
+        self.seq = 0
+
+    async def send(self, frame_type: str, data: str = "", done: bool = True):
+        """Send a single frame."""
+        frame = json.dumps({"type": frame_type, "seq": self.seq, "data": data, "done": done})
+        self.seq += 1
+        try:
+            async with asyncio.timeout(self.send_timeout):
+                await self.websocket.send_text(frame)
+        except TimeoutError:
+            raise SlowConsumer(f"Client did not accept a frame within {self.send_timeout} seconds.") from None
+
+    async def stream(self, frame_type: str, chunks):
+        """Send an async iterable of text deltas as few frames as possible, the last one with done=true."""
+        loop = asyncio.get_running_loop()
+        iterator = aiter(chunks)
+        buffer = []
+        size = 0
+        deadline = None
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(iterator, _END))
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if done:
+                    finished, pending = pending, None
+                    chunk = finished.result()
+                    if chunk is _END:
+                        break
+                    # The end of the message is the done flag, not an in-band marker
+                    if chunk == FINISHED or not chunk:
+                        continue
+                    buffer.append(chunk)
+                    size += len(chunk.encode("utf-8"))
+                    if deadline is None:
+                        deadline = loop.time() + self.interval
+                    if size < self.max_bytes:
+                        continue
+                # The time window elapsed or the buffer is full
+                await self.send(frame_type, "".join(buffer), done=False)
+                buffer, size, deadline = [], 0, None
+        finally:
+            if pending is not None:
+                pending.cancel()
+                try:
+                    await pending
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+        await self.send(frame_type, "".join(buffer), done=True)
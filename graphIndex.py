@@ -0,0 +1,79 @@
+import os
+import numpy as np
+
+# Cells per axis of the spatial index over the 2D layout
+GRID_CELLS = int(os.getenv("GRAPH_GRID_CELLS", "128"))
+# Points returned individually per view; larger views are aggregated into clusters
+MAX_VIEW_POINTS = int(os.getenv("GRAPH_MAX_POINTS", "2000"))
+# Cluster color is the highest urgency among its points
+URGENCY_COLORS = ("green", "yellow", "orange", "red")
+
+
+class GridIndex:
+    """Uniform grid over 2D points for viewport queries.
+
+    Points are sorted by grid cell, so the points of a cell range are one
+    contiguous slice of `order`; a viewport query only looks at the cells it
+    overlaps and then checks the points in the border cells exactly.
+    """
+
+    def __init__(self, coords, cells: int = GRID_CELLS):
+        self.coords = np.asarray(coords, dtype=np.float32).reshape(-1, 2)
+        self.cells = cells
+        if len(self.coords):
+            self.origin = self.coords.min(axis=0)
+            span = self.coords.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2, dtype=np.float32)
+            span = np.ones(2, dtype=np.float32)
+        span[span == 0] = 1.0
+        self.cell_size = span / cells
+
+        cx, cy = self._cell(self.coords[:, 0], self.coords[:, 1])
+        cell = cy * cells + cx
+        self.order = np.argsort(cell, kind="stable")
+        self.starts = np.searchsorted(cell[self.order], np.arange(cells * cells + 1))
+
+    def _cell(self, x, y):
+        cx = np.clip(((x - self.origin[0]) / self.cell_size[0]).astype(np.int64), 0, self.cells - 1)
+        cy = np.clip(((y - self.origin[1]) / self.cell_size[1]).astype(np.int64), 0, self.cells - 1)
+        return cx, cy
+
+    def query(self, x_min, x_max, y_min, y_max):
+        """Return the indices of the points inside the viewport."""
+        if len(self.coords) == 0:
+            return np.zeros(0, dtype=np.int64)
+        (cx0, cx1), (cy0, cy1) = self._cell(np.array([x_min, x_max]), np.array([y_min, y_max]))
+        slices = [
+            self.order[self.starts[cy * self.cells + cx0]:self.starts[cy * self.cells + cx1 + 1]]
+            for cy in range(cy0, cy1 + 1)
+        ]
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.sort(np.concatenate(slices))
+        x, y = self.coords[candidates, 0], self.coords[candidates, 1]
+        return candidates[(x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)]
+
+
+def cluster_points(coords, colors, cells):
+    """Aggregate points into at most cells x cells clusters.
+
+    Returns the cluster centroids, sizes and colors (highest urgency color of
+    the points in each cluster).
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    origin = coords.min(axis=0)
+    span = coords.max(axis=0) - origin
+    span[span == 0] = 1.0
+    grid = np.clip(((coords - origin) / span * cells).astype(np.int64), 0, cells - 1)
+    cell_ids, members = np.unique(grid[:, 1] * cells + grid[:, 0], return_inverse=True)
+
+    sizes = np.bincount(members, minlength=len(cell_ids))
+    centroids = np.stack([
+        np.bincount(members, weights=coords[:, 0], minlength=len(cell_ids)) / sizes,
+        np.bincount(members, weights=coords[:, 1], minlength=len(cell_ids)) / sizes,
+    ], axis=1)
+    ranks = np.array([URGENCY_COLORS.index(color) if color in URGENCY_COLORS else 1 for color in colors])
+    top = np.zeros(len(cell_ids), dtype=np.int64)
+    np.maximum.at(top, members, ranks)
+    return centroids, sizes, [URGENCY_COLORS[rank] for rank in top]
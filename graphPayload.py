@@ -0,0 +1,57 @@
+import gzip
+import json
+import struct
+import numpy as np
+
+# Formats of the /graph-data body and their media types
+GRAPH_MEDIA_TYPES = {
+    "json": "application/json",
+    "binary": "application/octet-stream",
+}
+# Decimals kept of the 2D coordinates in the JSON format
+COORD_DECIMALS = 4
+GZIP_LEVEL = 6
+
+
+def graph_columns(rows):
+    """Graph point attributes as parallel arrays, one entry per point."""
+    return {
+        "count": len(rows),
+        "issue_id": [row["issue_id"] for row in rows],
+        "title": [row["title"] for row in rows],
+        "marker": [row["marker"] for row in rows],
+        "color": [row["color"] for row in rows],
+    }
+
+
+def encode_json(columns, arrays):
+    """Columnar JSON: the attribute columns plus the numeric arrays as lists."""
+    body = dict(columns)
+    for name, values in arrays.items():
+        body[name] = np.asarray(values, dtype=np.float64).round(COORD_DECIMALS).tolist()
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def encode_binary(columns, arrays):
+    """Binary layout for typed arrays in the browser.
+
+    uint32 (little endian) length of a UTF-8 JSON header, the header, zero
+    padding to a multiple of 4 bytes, then the numeric arrays as float32, one
+    after the other. The header holds the attribute columns and, under
+    "arrays", the [name, length] of each float32 array in order.
+    """
+    header = dict(columns)
+    arrays = {name: np.ascontiguousarray(values, dtype="<f4") for name, values in arrays.items()}
+    header["arrays"] = [[name, len(values)] for name, values in arrays.items()]
+    header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    padding = -(4 + len(header)) % 4
+    return b"".join([struct.pack("<I", len(header)), header, b"\0" * padding] + [values.tobytes() for values in arrays.values()])
+
+
+def encode_graph(columns, arrays, response_format="json", compress=False):
+    """Encode graph columns and numeric arrays for /graph-data, optionally gzip-compressed."""
+    encoders = {"json": encode_json, "binary": encode_binary}
+    body = encoders[response_format](columns, arrays)
+    if compress:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
@@ -1,10 +1,23 @@
 import weaviate
 import os
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
 import openai
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import pandas as pd
 from weaviate import auth
 from weaviate.classes.config import Property, DataType, Tokenization
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
+from vectorStore import VectorStore
+from vectorMirror import get_mirror
+from collectionVersion import bump_collection_version
+from metrics import counter, histogram, REGISTRY
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +31,30 @@ client = weaviate.connect_to_wcs(
     }
 )
 
+ISSUES_PATH = 'data/github_issues.pkl'
+# Content hash of every issue that is known to be in Weaviate, keyed by issue_id
+CHECKPOINT_PATH = os.getenv("IMPORT_CHECKPOINT_PATH", "data/import_checkpoint.json")
+# Urgency scores keyed by a hash of title and body
+URGENCY_CACHE_PATH = os.getenv("URGENCY_CACHE_PATH", "data/urgency_cache.json")
+# Issues imported between two checkpoints
+CHECKPOINT_EVERY = int(os.getenv("IMPORT_CHECKPOINT_EVERY", "500"))
+DELETE_BATCH_SIZE = 1000
+# Client-side embeddings (--embed-locally): model, titles per request and on-disk cache
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+VECTOR_CACHE_PATH = os.getenv("VECTOR_CACHE_PATH", "data/vector_cache")
+# How the imported vectors were made ("local" or "weaviate"); a sync must not mix the two vector spaces
+EMBEDDING_MODE_PATH = os.getenv("IMPORT_EMBEDDING_MODE_PATH", "data/import_embedding_mode.json")
+# Metrics of the last import in the Prometheus text format, for node_exporter's textfile collector
+IMPORT_METRICS_PATH = os.getenv("IMPORT_METRICS_PATH", "data/import_metrics.prom")
+
+IMPORT_ISSUES = counter("import_issues_total", "Issues processed by the import.", ["result"])
+IMPORT_CHUNK_SECONDS = histogram("import_chunk_seconds", "Seconds per imported chunk of CHECKPOINT_EVERY issues.")
+IMPORT_LLM_REQUEST_SECONDS = histogram(
+    "import_llm_request_seconds", "Seconds per OpenAI request of the import, including retries.", ["kind"]
+)
+
 def clear_data():
     """Clear data if a collection exists."""
     client.collections.delete("GithubIssues")
@@ -74,76 +111,448 @@ def create_solved_collection():
     print(client.collections.exists("Solved"))
 
 
+# Number of scoring requests that may run at the same time
+URGENCY_CONCURRENCY = int(os.getenv("URGENCY_CONCURRENCY", "8"))
+# Account limits for the scoring model
+URGENCY_REQUESTS_PER_MINUTE = int(os.getenv("URGENCY_RPM", "3000"))
+URGENCY_TOKENS_PER_MINUTE = int(os.getenv("URGENCY_TPM", "250000"))
+URGENCY_MAX_RETRIES = int(os.getenv("URGENCY_MAX_RETRIES", "5"))
+# Issues scored per prompt; above 1 the model answers with structured JSON
+URGENCY_BATCH_SIZE = int(os.getenv("URGENCY_BATCH_SIZE", "1"))
+
+URGENCY_PROMPT = "Rate the Urgency from the given Issue or Pull Request. Respond with one number only. 1 = not very urgent, 4 = extremely urgent."
+BATCH_URGENCY_PROMPT = (
+    "Rate the Urgency of each given Issue or Pull Request. 1 = not very urgent, 4 = extremely urgent. "
+    'Respond with JSON of the form {"scores": [{"id": <id>, "urgency": <1-4>}, ...]} covering every id.'
+)
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by all scoring threads."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.capacity = (float(requests_per_minute), float(tokens_per_minute))
+        self.available = list(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """Block until one request with `tokens` tokens fits into both budgets."""
+        tokens = min(tokens, self.capacity[1])
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.updated = now
+                self.available = [
+                    min(capacity, available + elapsed * capacity / 60)
+                    for capacity, available in zip(self.capacity, self.available)
+                ]
+                missing_requests = 1 - self.available[0]
+                missing_tokens = tokens - self.available[1]
+                if missing_requests <= 0 and missing_tokens <= 0:
+                    self.available[0] -= 1
+                    self.available[1] -= tokens
+                    return
+                wait = max(missing_requests * 60 / self.capacity[0], missing_tokens * 60 / self.capacity[1])
+            time.sleep(wait)
+
+
+rate_limiter = RateLimiter(URGENCY_REQUESTS_PER_MINUTE, URGENCY_TOKENS_PER_MINUTE)
+
+
+def with_retries(request, tokens, kind):
+    """Run an OpenAI request under the rate limiter, retrying transient errors with exponential backoff."""
+    with IMPORT_LLM_REQUEST_SECONDS.time(kind=kind):
+        for attempt in range(URGENCY_MAX_RETRIES + 1):
+            rate_limiter.acquire(tokens)
+            try:
+                return request()
+            except RETRYABLE_ERRORS as e:
+                if attempt == URGENCY_MAX_RETRIES:
+                    raise
+                delay = min(60, 2 ** attempt) + random.uniform(0, 1)
+                print(f"{kind.capitalize()} request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
 def generate_urgency(title, body):
     """Generate an urgency score using OpenAI GPT."""
-    response = openai.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "Rate the Urgency from the given Issue or Pull Request. Respond with one number only. 1 = not very urgent, 4 = extremely urgent."},
-            {"role": "user", "content": f"This is the title of the issue or pull request: '{title}' and the body: '{body}'"}
-        ],
-        temperature=1,
-        max_tokens=1
+    messages = [
+        {"role": "system", "content": URGENCY_PROMPT},
+        {"role": "user", "content": f"This is the title of the issue or pull request: '{title}' and the body: '{body}'"}
+    ]
+    response = with_retries(
+        lambda: openai.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=1,
+            max_tokens=1
+        ),
+        estimate_tokens(URGENCY_PROMPT + messages[1]["content"]) + 1,
+        "urgency"
     )
     urgency = response.choices[0].message.content
-    print(urgency)
     return urgency
 
-def load_data_to_weaviate():
-    """Load issues and pull requests into Weaviate."""
-    df = pd.read_pickle('data/github_issues.pkl')
+
+def generate_urgencies(issues):
+    """Score several issues in one prompt with structured output.
+
+    `issues` is a list of (issue_id, title, body) tuples; returns the urgencies
+    in the same order. Issues missing from the answer are scored one by one.
+    """
+    if len(issues) == 1:
+        return [generate_urgency(issues[0][1], issues[0][2])]
+
+    listing = "\n\n".join(f"id: {issue_id}\ntitle: '{title}'\nbody: '{body}'" for issue_id, title, body in issues)
+    response = with_retries(
+        lambda: openai.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": BATCH_URGENCY_PROMPT},
+                {"role": "user", "content": listing}
+            ],
+            temperature=1,
+            response_format={"type": "json_object"}
+        ),
+        estimate_tokens(BATCH_URGENCY_PROMPT + listing) + 20 * len(issues),
+        "urgency_batch"
+    )
+    try:
+        scores = json.loads(response.choices[0].message.content)["scores"]
+        by_id = {str(score["id"]): str(score["urgency"]) for score in scores}
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Could not parse batch urgency answer: {e}")
+        by_id = {}
+    return [by_id.get(str(issue_id)) or generate_urgency(title, body) for issue_id, title, body in issues]
+
+
+def score_group(group):
+    """Score a group of prepared issues; failed scores become an empty urgency."""
+    try:
+        return generate_urgencies([(p["issue_id"], p["title"], p["body"]) for p in group])
+    except openai.OpenAIError as e:
+        print(f"Urgency scoring failed for {[p['issue_id'] for p in group]}: {e}")
+        return [""] * len(group)
+
+
+def embedding_key(text):
+    """Cache key of an embedding: the model and the embedded text."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+
+def embed_issues(issues, vector_cache):
+    """Return the title embeddings of `issues` keyed by issue_id.
+
+    Titles already in the vector cache are read from disk; the rest are
+    embedded in requests of EMBEDDING_BATCH_SIZE titles and added to the cache.
+    """
+    keys = [embedding_key(properties["title"]) for properties in issues]
+    _, missing = vector_cache.get_many(keys)
+    texts = {key: properties["title"] for key, properties in zip(keys, issues)}
+    missing = list(dict.fromkeys(missing))
+
+    for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch_keys = missing[start:start + EMBEDDING_BATCH_SIZE]
+        batch_texts = [texts[key] or " " for key in batch_keys]
+        response = with_retries(
+            lambda: openai.embeddings.create(model=EMBEDDING_MODEL, input=batch_texts),
+            sum(estimate_tokens(text) for text in batch_texts),
+            "embedding"
+        )
+        vector_cache.put_many(batch_keys, [item.embedding for item in sorted(response.data, key=lambda item: item.index)])
+
+    vectors, _ = vector_cache.get_many(keys)
+    return {properties["issue_id"]: vector for properties, vector in zip(issues, vectors)}
+
+
+def prepare_issues(df):
+    """Convert the DataFrame into Weaviate properties (without urgency), column by column."""
+    columns = {
+        name: df[name].astype(str).tolist()
+        for name in ("title", "body", "repo_name", "state", "created", "updated", "user_login", "url", "user_type")
+    }
+    issue_ids = df.index.astype(str).tolist()
+    types = ["pull request" if pr == "pull-request" else "issue" for pr in df["pr"].astype(str)]
+    comments = df["comments"].fillna(0).astype(int).tolist()
+    labels = [list(map(str, value)) for value in df["labels"]]
+    assignees = [list(map(str, value)) for value in df["assignees"]]
+
+    return [
+        {
+            "issue_id": issue_ids[i],  # Add the index value as `issue_id`
+            "title": columns["title"][i],
+            "body": columns["body"][i],
+            "type": types[i],
+            "repo_name": columns["repo_name"][i],
+            "state": columns["state"][i],
+            "created": columns["created"][i],
+            "updated": columns["updated"][i],
+            "user_login": columns["user_login"][i],
+            "url": columns["url"][i],
+            "comments": comments[i],
+            "user_type": columns["user_type"][i],
+            "labels": labels[i],
+            "assignees": assignees[i]
+        }
+        for i in range(len(df))
+    ]
+
+
+def content_hash(properties):
+    """Hash of an issue's imported content, used to detect new and changed rows."""
+    return hashlib.sha256(json.dumps(properties, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def urgency_key(properties):
+    """Cache key of an urgency score: only the title and body go into the prompt."""
+    return hashlib.sha256(f"{properties['title']}\0{properties['body']}".encode("utf-8")).hexdigest()
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    """Write JSON atomically so an interrupted import never leaves a broken file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def import_chunk(collection, issues, urgency_cache, vector_cache=None):
+    """Score and batch-import one chunk of issues; returns the issue_ids that failed.
+
+    With a vector cache the titles are embedded client-side (in parallel with
+    the scoring) and objects are inserted with explicit vectors, so Weaviate
+    does not vectorize them again.
+    """
+    cached = []
+    pending = []
+    uuids = {}
+    unscored = set()
+    with ThreadPoolExecutor(max_workers=URGENCY_CONCURRENCY) as pool, collection.batch.dynamic() as batch:
+        vectors = pool.submit(embed_issues, issues, vector_cache) if vector_cache is not None else None
+
+        def add(properties):
+            # Display the current progress
+            print(f"Importing {properties['type']} {properties['issue_id']} (urgency {properties['urgency']}): {properties['title']}")
+
+            # Derive the UUID from the issue_id so issues can be looked up by key
+            uuid = generate_uuid5(properties["issue_id"])
+            uuids[str(uuid)] = properties["issue_id"]
+            if vectors is None:
+                batch.add_object(properties, uuid=uuid)
+            else:
+                batch.add_object(properties, uuid=uuid, vector=vectors.result()[properties["issue_id"]].tolist())
+
+        for properties in issues:
+            urgency = urgency_cache.get(urgency_key(properties))
+            if urgency is None:
+                pending.append(properties)
+            else:
+                cached.append(dict(properties, urgency=urgency))
+
+        # Start scoring before adding anything: add() waits for the embeddings
+        groups = [pending[i:i + URGENCY_BATCH_SIZE] for i in range(0, len(pending), URGENCY_BATCH_SIZE)]
+        futures = {pool.submit(score_group, group): group for group in groups}
+        for properties in cached:
+            add(properties)
+        for future in as_completed(futures):
+            for properties, urgency in zip(futures[future], future.result()):
+                if urgency:
+                    urgency_cache[urgency_key(properties)] = urgency
+                else:
+                    # Imported without a score; left out of the checkpoint so the next sync retries it
+                    unscored.add(properties["issue_id"])
+                add(dict(properties, urgency=urgency))
+
+    failed = {uuids.get(str(error.original_uuid)) for error in collection.batch.failed_objects}
+    for error in collection.batch.failed_objects[:5]:
+        print(f"Failed to import object: {error.message}")
+    return failed | unscored
+
+
+def mirror_issues(collection, issues, vector_cache=None):
+    """Copy the vectors of freshly imported issues into the local vector mirror.
+
+    Client-side embeddings are taken from the vector cache; otherwise the
+    vectors Weaviate computed are fetched back in one filtered query.
+    """
+    mirror = get_mirror("GithubIssues")
+    if vector_cache is not None:
+        vectors, _ = vector_cache.get_many([embedding_key(properties["title"]) for properties in issues])
+        mirror.upsert([properties["issue_id"] for properties in issues], vectors)
+        return
+    issue_ids = [properties["issue_id"] for properties in issues]
+    for start in range(0, len(issue_ids), DELETE_BATCH_SIZE):
+        ids = issue_ids[start:start + DELETE_BATCH_SIZE]
+        response = collection.query.fetch_objects(
+            filters=Filter.by_property("issue_id").contains_any(ids),
+            include_vector=True,
+            return_properties=["issue_id"],
+            limit=2 * len(ids)
+        )
+        mirror.upsert_objects(response.objects)
+
+
+def load_data_to_weaviate(issues=None, checkpoint=None, embed_locally=False):
+    """Load issues and pull requests into Weaviate.
+
+    Urgency scores are computed on a thread pool (URGENCY_CONCURRENCY) under
+    the shared rate limiter and reused from the urgency cache when the title
+    and body did not change. Issues are imported in chunks of CHECKPOINT_EVERY;
+    after each chunk the checkpoint records the content hash of every issue
+    that made it into Weaviate, so an interrupted import resumes there.
+    With `embed_locally` the vectors come from the on-disk vector cache.
+    Imported vectors are mirrored locally after every chunk.
+    """
+    if issues is None:
+        issues = prepare_issues(pd.read_pickle(ISSUES_PATH))
+    checkpoint = {} if checkpoint is None else checkpoint
+    urgency_cache = load_json(URGENCY_CACHE_PATH)
+    hashes = {properties["issue_id"]: content_hash(properties) for properties in issues}
+    vector_cache = VectorStore(VECTOR_CACHE_PATH, EMBEDDING_DIMENSIONS) if embed_locally else None
 
     # Prepare the collection for batch import
     collection = client.collections.get("GithubIssues")
 
-    with collection.batch.dynamic() as batch:
-        for i, (issue_id, row) in enumerate(df.iterrows(), start=1):
-            # Extract properties from the row, including the index as `issue_id`
-            title = str(row['title'])
-            body = str(row['body'])
-            pr = str(row['pr'])
-            repo_name = str(row['repo_name'])
-            state = str(row['state'])
-            created = str(row['created'])
-            updated = str(row['updated'])
-            user_login = str(row['user_login'])
-            url = str(row['url'])
-            comments = int(row['comments']) if row['comments'] else 0
-            user_type = str(row['user_type'])
-            labels = list(map(str, row['labels']))
-            assignees = list(map(str, row['assignees']))
-
-            # Display the current progress using `i`
-            print(f"Importing {pr} {i}/{len(df)}: {title}")
-
-            # Determine urgency
-            urgency = generate_urgency(title, body)
-
-            # Prepare properties with the new schema, including the `issue_id` field
-            properties = {
-                "issue_id": str(issue_id),  # Add the index value as `issue_id`
-                "title": title,
-                "body": body,
-                "urgency": urgency,
-                "type": "pull request" if pr == "pull-request" else "issue",
-                "repo_name": repo_name,
-                "state": state,
-                "created": created,
-                "updated": updated,
-                "user_login": user_login,
-                "url": url,
-                "comments": comments,
-                "user_type": user_type,
-                "labels": labels,
-                "assignees": assignees
-            }
-
-            batch.add_object(properties)
-
-    print("All data imported successfully with urgency, issue ID, and additional properties.")
+    failed_total = 0
+    started = time.perf_counter()
+    for start in range(0, len(issues), CHECKPOINT_EVERY):
+        chunk = issues[start:start + CHECKPOINT_EVERY]
+        with IMPORT_CHUNK_SECONDS.time():
+            failed = import_chunk(collection, chunk, urgency_cache, vector_cache)
+            failed_total += len(failed)
+            mirror_issues(collection, [properties for properties in chunk if properties["issue_id"] not in failed], vector_cache)
+        bump_collection_version("GithubIssues")
+        IMPORT_ISSUES.inc(len(chunk) - len(failed), result="imported")
+        IMPORT_ISSUES.inc(len(failed), result="failed")
+        for properties in chunk:
+            if properties["issue_id"] not in failed:
+                checkpoint[properties["issue_id"]] = hashes[properties["issue_id"]]
+        save_json(URGENCY_CACHE_PATH, urgency_cache)
+        save_json(CHECKPOINT_PATH, checkpoint)
+        REGISTRY.write_textfile(IMPORT_METRICS_PATH)
+        processed = min(start + CHECKPOINT_EVERY, len(issues))
+        print(f"Checkpoint: {processed}/{len(issues)} issues processed "
+              f"({processed / max(time.perf_counter() - started, 1e-9):.1f} issues/s)")
+
+    if failed_total:
+        print(f"{failed_total} issues failed to import and will be retried on the next sync.")
+    else:
+        print("All data imported successfully with urgency, issue ID, and additional properties.")
+
+
+def solved_issue_ids(issue_ids):
+    """Return the issue_ids among `issue_ids` that are in the Solved collection."""
+    solved = client.collections.get("Solved")
+    found = set()
+    for start in range(0, len(issue_ids), DELETE_BATCH_SIZE):
+        ids = issue_ids[start:start + DELETE_BATCH_SIZE]
+        response = solved.query.fetch_objects(
+            filters=Filter.by_property("issue_id").contains_any(ids),
+            return_properties=["issue_id"],
+            limit=2 * len(ids)
+        )
+        found.update(o.properties["issue_id"] for o in response.objects)
+    return found
+
+
+def check_embedding_mode(embed_locally):
+    """Record how vectors are made, or return False if the collection was imported the other way.
+
+    Client-side title embeddings are not the vectors text2vec_openai computes
+    for this schema (it also embeds the property name and the type), so one
+    collection must stick to one mode until the next full import.
+    """
+    mode = "local" if embed_locally else "weaviate"
+    recorded = load_json(EMBEDDING_MODE_PATH).get("embedding")
+    if recorded is not None and recorded != mode:
+        flag = "with" if recorded == "local" else "without"
+        print(f"The collection was imported with {recorded} embeddings; sync {flag} --embed-locally "
+              f"or run a full import to switch.")
+        return False
+    save_json(EMBEDDING_MODE_PATH, {"embedding": mode})
+    return True
+
+
+def sync_data_to_weaviate(embed_locally=False):
+    """Incrementally sync the collection with the pickle.
+
+    Only issues whose content hash differs from the checkpoint are upserted
+    (their deterministic UUID makes the batch overwrite the old object), and
+    issues that disappeared from the pickle are deleted. Issues that were
+    resolved in the app stay in Solved: they are checkpointed, not upserted.
+    Refuses to run with another embedding mode than the import used, and
+    without a checkpoint: objects of an import from before checkpoints have
+    random UUIDs, so upserting every issue would duplicate them.
+    """
+    if not os.path.exists(CHECKPOINT_PATH):
+        print(f"No import checkpoint at {CHECKPOINT_PATH}; run a full import (without --sync) first.")
+        return
+    if not check_embedding_mode(embed_locally):
+        return
+    checkpoint = load_json(CHECKPOINT_PATH)
+    issues = prepare_issues(pd.read_pickle(ISSUES_PATH))
+    changed = [properties for properties in issues if checkpoint.get(properties["issue_id"]) != content_hash(properties)]
+
+    # Upserting a resolved issue would put it back into GithubIssues next to its copy in Solved
+    solved = solved_issue_ids([properties["issue_id"] for properties in changed])
+    if solved:
+        for properties in changed:
+            if properties["issue_id"] in solved:
+                checkpoint[properties["issue_id"]] = content_hash(properties)
+        changed = [properties for properties in changed if properties["issue_id"] not in solved]
+        save_json(CHECKPOINT_PATH, checkpoint)
+
+    current_ids = {properties["issue_id"] for properties in issues}
+    removed = [issue_id for issue_id in checkpoint if issue_id not in current_ids]
+    if removed:
+        collection = client.collections.get("GithubIssues")
+        for start in range(0, len(removed), DELETE_BATCH_SIZE):
+            ids = removed[start:start + DELETE_BATCH_SIZE]
+            collection.data.delete_many(where=Filter.by_id().contains_any([generate_uuid5(issue_id) for issue_id in ids]))
+            for issue_id in ids:
+                del checkpoint[issue_id]
+        get_mirror("GithubIssues").delete(removed)
+        bump_collection_version("GithubIssues")
+        save_json(CHECKPOINT_PATH, checkpoint)
+
+    print(f"Sync: {len(changed)} new or changed, {len(removed)} removed, {len(solved)} already solved, "
+          f"{len(issues) - len(changed) - len(solved)} unchanged")
+    if changed:
+        load_data_to_weaviate(changed, checkpoint, embed_locally)
 
 # Main execution
 if __name__ == "__main__":
-    clear_data()
-    create_collection()
-    load_data_to_weaviate()
+    parser = argparse.ArgumentParser(description="Import the GitHub issues into Weaviate.")
+    parser.add_argument("--sync", action="store_true", help="only upsert new or changed issues and delete removed ones (also resumes an interrupted import)")
+    parser.add_argument("--embed-locally", action="store_true", help="embed titles client-side in batches, cache the vectors on disk and import them with explicit vectors; a --sync must use the same setting as the full import")
+    args = parser.parse_args()
+
+    if args.sync:
+        sync_data_to_weaviate(args.embed_locally)
+    else:
+        clear_data()
+        create_collection()
+        create_solved_collection()
+        for name in ("GithubIssues", "Solved"):
+            # Both collections start out empty, so their mirrors are complete from here on
+            get_mirror(name).clear()
+            get_mirror(name).mark_complete()
+            bump_collection_version(name)
+        save_json(CHECKPOINT_PATH, {})
+        save_json(EMBEDDING_MODE_PATH, {"embedding": "local" if args.embed_locally else "weaviate"})
+        load_data_to_weaviate(embed_locally=args.embed_locally)
@@ -0,0 +1,42 @@
+from conversationContext import truncate_tokens, ISSUE_BODY_TOKEN_LIMIT
+
+# Properties of an issue that go into the chat context
+ISSUE_CONTEXT_PROPERTIES = ("issue_id", "title", "type", "repo_name", "state", "urgency", "labels", "url", "body")
+# Properties of similar solved issues that go into the suggested-reply prompt
+SIMILAR_ISSUE_PROPERTIES = ["issue_id", "title", "body", "url"]
+# Characters of a similar issue's body that are included
+SIMILAR_BODY_CHARS = 400
+
+
+def shorten(text, limit):
+    """Cut text to `limit` characters on a word boundary."""
+    text = " ".join(str(text or "").split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
+def format_issue_context(issue_details):
+    """Describe an issue for the system message, one property per line."""
+    lines = []
+    for name in ISSUE_CONTEXT_PROPERTIES:
+        value = issue_details.get(name)
+        if value in (None, "", []):
+            continue
+        if isinstance(value, list):
+            value = ", ".join(map(str, value))
+        if name == "body":
+            value = truncate_tokens(str(value), ISSUE_BODY_TOKEN_LIMIT)
+        lines.append(f"{name}: {value}")
+    return "You are discussing an issue with the following details:\n" + "\n".join(lines)
+
+
+def format_similar_issues(similar_issues):
+    """Compact list of similar solved issues for the suggested-reply prompt."""
+    if not similar_issues:
+        return ""
+    entries = [
+        f"{i}. {issue.get('title', '')} ({issue.get('url', '')})\n   {shorten(issue.get('body'), SIMILAR_BODY_CHARS)}"
+        for i, issue in enumerate(similar_issues, start=1)
+    ]
+    return "Similar issues that were already solved:\n" + "\n".join(entries)
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from ttlCache import TTLCache
+
+# Worker processes for CPU-heavy jobs (projections); one core is left for the web server
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Seconds finished jobs stay queryable through /jobs
+JOB_HISTORY_TTL = float(os.getenv("JOB_HISTORY_TTL", "3600"))
+
+
+class JobCancelled(Exception):
+    """The job was cancelled before it produced a result."""
+
+
+class Job:
+    """A function call running on the job queue's process pool."""
+
+    def __init__(self, key, name: str, future):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.name = name
+        self.future = future
+        self.created = time.time()
+        self.finished = None
+        self.cancelled = False
+
+    @property
+    def status(self) -> str:
+        if self.cancelled or self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            return "running" if self.future.running() else "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def result(self, timeout: float = None):
+        """Wait for the job and return its result; raises JobCancelled if it was cancelled."""
+        try:
+            result = self.future.result(timeout)
+        except CancelledError:
+            raise JobCancelled(f"Job {self.id} ({self.name}) was cancelled.") from None
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} ({self.name}) was cancelled.")
+        return result
+
+    def to_dict(self) -> dict:
+        status = self.status
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": status,
+            "created": self.created,
+            "finished": self.finished,
+            "error": str(self.future.exception()) if status == "failed" else None
+        }
+
+
+class JobQueue:
+    """Process pool with a job queue for CPU-heavy work.
+
+    Jobs wait in the pool's queue until a worker process is free. Submitting a
+    job with the key of one that is still queued or running returns that job
+    instead of starting another. Cancelling a queued job removes it from the
+    queue; a job that is already running finishes in its worker, but its
+    result is discarded and waiters get JobCancelled. The pool is started on
+    first use, with spawned workers so they do not inherit the server's
+    threads and connections.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history_ttl: float = JOB_HISTORY_TTL):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = {}
+        self._jobs = TTLCache(maxsize=1024, ttl=history_ttl)
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, key, fn, *args, name: str = None) -> Job:
+        """Queue `fn(*args)` in a worker process, or return the active job with the same key."""
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and job.status in ("queued", "running"):
+                return job
+            job = Job(key, name or fn.__name__, self._pool().submit(fn, *args))
+            self._active[key] = job
+            self._jobs.set(job.id, job)
+        job.future.add_done_callback(lambda future: self._finished(job))
+        return job
+
+    def run(self, key, fn, *args, name: str = None):
+        """Submit a job and block until its result is available."""
+        return self.submit(key, fn, *args, name=name).result()
+
+    def _finished(self, job: Job):
+        job.finished = time.time()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    def get(self, job_id: str) -> Job:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        """Return the known jobs, oldest first."""
+        return sorted(self._jobs.values(), key=lambda job: job.created)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it is unknown or already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return False
+        if not job.future.cancel():
+            job.cancelled = True
+        job.finished = time.time()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,358 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+import numpy as np
+from visualizeData import clean_graph_rows, project_vectors, graph_points, DEFAULT_PROJECTION_ENGINE
+from graphPayload import encode_graph, graph_columns
+from graphIndex import GridIndex, cluster_points, MAX_VIEW_POINTS
+from jobQueue import job_queue, JobCancelled
+from metrics import stage
+from ttlCache import TTLCache
+from vectorMirror import get_mirror
+
+LAYOUT_CACHE_DIR = os.getenv("LAYOUT_CACHE_DIR", "data")
+# Share of incrementally placed points after which a full re-fit is scheduled
+LAYOUT_DRIFT_THRESHOLD = float(os.getenv("LAYOUT_DRIFT_THRESHOLD", "0.1"))
+# Number of nearest neighbours used to place a new point
+LAYOUT_NEIGHBOURS = 5
+# Encoded filtered/viewport views kept per layout version
+LAYOUT_VIEW_CACHE_SIZE = int(os.getenv("LAYOUT_VIEW_CACHE_SIZE", "256"))
+
+
+def place_points(mirror, new_vectors, positions, coords, k=LAYOUT_NEIGHBOURS):
+    """Place new points at the similarity-weighted mean of their nearest neighbours in the layout.
+
+    The neighbours are looked up in the vector mirror among the issue_ids of
+    `positions` (issue_id -> row of `coords`).
+    """
+    placed = np.zeros((len(new_vectors), 2), dtype=np.float32)
+    if len(new_vectors) == 0 or not positions:
+        return placed
+    for j, neighbours in enumerate(mirror.nearest_many(new_vectors, k, positions)):
+        if neighbours:
+            weights = np.clip([similarity for _, similarity in neighbours], 1e-6, None)
+            placed[j] = (weights / weights.sum()) @ coords[[positions[issue_id] for issue_id, _ in neighbours]]
+    return placed
+
+
+class LayoutCache:
+    """2D layout of a collection, computed once and then updated incrementally.
+
+    Only the rows and 2D coordinates are kept (and saved); the vectors are read
+    from the GithubIssues vector mirror, to place new issues next to their
+    nearest neighbours without a new t-SNE run and for the full re-fit that
+    runs in the background once too many points have been placed that way.
+    `version` is a random token that changes whenever the layout does and is
+    saved with it, so it names the same layout in every worker that loaded it
+    (ETags are built from it). `synced_version` is the collection version
+    (see collectionVersion) the layout was last synced with. There is one
+    cache per projection engine.
+    """
+
+    def __init__(self, engine: str = DEFAULT_PROJECTION_ENGINE, path: str = None, drift_threshold: float = LAYOUT_DRIFT_THRESHOLD,
+                 mirror=None):
+        self.engine = engine
+        self.path = path or os.path.join(LAYOUT_CACHE_DIR, f"layout_cache_{engine}.npz")
+        self.drift_threshold = drift_threshold
+        self.mirror = mirror or get_mirror("GithubIssues")
+        self.rows = []
+        self.coords = np.zeros((0, 2), dtype=np.float32)
+        self.version = uuid.uuid4().hex
+        self.synced_version = None
+        self.placed_since_fit = 0
+        self.refit_running = False
+        self._index = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._payloads = {}
+        self._views = TTLCache(maxsize=LAYOUT_VIEW_CACHE_SIZE, ttl=float("inf"))
+        self._grid = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def matches(self, collection_version) -> bool:
+        """Return True if the cached layout was synced with this version of the collection."""
+        return len(self.rows) > 1 and self.synced_version == collection_version
+
+    def needs_refit(self) -> bool:
+        """Return True if incremental placements have drifted past the threshold."""
+        if not self.rows or self.refit_running:
+            return False
+        return self.placed_since_fit / len(self.rows) > self.drift_threshold
+
+    def load(self):
+        """Load a previously saved layout from disk, if there is one."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                coords = data["coords"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load layout cache from {self.path}: {e}")
+            return
+        with self._lock:
+            self.rows = meta["rows"]
+            self.version = str(meta["version"])
+            self.synced_version = meta.get("synced_version")
+            self.placed_since_fit = meta["placed_since_fit"]
+            self.coords = coords
+            self._index = {row["issue_id"]: i for i, row in enumerate(self.rows)}
+            self._payloads = {}
+            self._views.clear()
+            self._grid = None
+
+    def save(self):
+        """Persist the rows and coordinates of the layout to disk."""
+        with self._lock:
+            meta = json.dumps({
+                "rows": self.rows,
+                "version": self.version,
+                "synced_version": self.synced_version,
+                "placed_since_fit": self.placed_since_fit
+            })
+            coords = self.coords
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One temporary file per writer: concurrent first fits may save at the same time
+        tmp_path = f"{self.path}.{os.getpid()}-{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, meta=np.array(meta), coords=coords)
+        os.replace(tmp_path, self.path)
+
+    def sync(self, collection_output, collection_version=None):
+        """Bring the layout in line with the complete collection at `collection_version`.
+
+        Runs a full fit if there is no layout yet; otherwise drops the issues
+        that disappeared and places the new ones next to their neighbours.
+        """
+        vectors, rows = clean_graph_rows(collection_output)
+        if not self.rows:
+            self.fit(vectors, rows, collection_version)
+            return
+        if len(vectors) < 2:
+            return
+
+        self.sync_page(collection_output)
+        self.finish_sync({row["issue_id"] for row in rows}, collection_version)
+
+    def fit(self, vectors, rows, collection_version=None):
+        """Fit a new layout to the whole collection, given as a float32 matrix and its graph rows."""
+        if len(vectors) < 2:
+            return
+        coords = self._project(rows, vectors)
+        with self._lock:
+            self.synced_version = collection_version
+        self._replace(rows, coords)
+        self.save()
+
+    def sync_page(self, page_output):
+        """Merge one page of the collection into an existing layout and return its graph points.
+
+        Known issues keep their position (their attributes are refreshed), new
+        issues are placed next to their nearest neighbours.
+        """
+        vectors, rows = clean_graph_rows(page_output)
+        with self._lock:
+            positions = []
+            new = []
+            changed = False
+            for j, row in enumerate(rows):
+                i = self._index.get(row["issue_id"])
+                if i is None:
+                    new.append(j)
+                    continue
+                if self.rows[i] != row:
+                    self.rows[i] = row
+                    changed = True
+                positions.append(i)
+
+            if new:
+                new_coords = place_points(self.mirror, vectors[new], self._index, self.coords)
+                start = len(self.rows)
+                self.rows.extend(rows[j] for j in new)
+                self.coords = np.vstack([self.coords, new_coords])
+                self.placed_since_fit += len(new)
+                positions.extend(range(start, len(self.rows)))
+
+            if changed or new:
+                self._changed()
+                self._dirty = True
+            return graph_points([self.rows[i] for i in positions], self.coords[positions])
+
+    def finish_sync(self, seen_ids, collection_version=None):
+        """Drop the issues that were not seen during a paged sync and persist the layout."""
+        with self._lock:
+            keep = [i for i, row in enumerate(self.rows) if row["issue_id"] in seen_ids]
+            if len(keep) < len(self.rows):
+                self._keep(keep)
+                self._dirty = True
+            if self.synced_version != collection_version:
+                self.synced_version = collection_version
+                self._dirty = True
+            dirty, self._dirty = self._dirty, False
+        if dirty:
+            self.save()
+
+    def remove(self, issue_ids):
+        """Drop issues from the layout (e.g. after they were migrated)."""
+        issue_ids = set(issue_ids)
+        with self._lock:
+            if not issue_ids & self._index.keys():
+                return
+            self._keep([i for i, row in enumerate(self.rows) if row["issue_id"] not in issue_ids])
+        self.save()
+
+    def iter_points(self, batch_size: int):
+        """Yield the graph points of the current layout in batches."""
+        with self._lock:
+            rows, coords = list(self.rows), self.coords
+        for start in range(0, len(rows), batch_size):
+            yield graph_points(rows[start:start + batch_size], coords[start:start + batch_size])
+
+    def refit(self):
+        """Re-project the mirrored vectors of all points and swap in the new layout."""
+        with self._lock:
+            if len(self.rows) < 2:
+                self.refit_running = False
+                return
+            self.refit_running = True
+            rows = list(self.rows)
+        try:
+            vectors, missing = self.mirror.vectors([row["issue_id"] for row in rows])
+            # Issues that left the mirror (e.g. migrated) are neither fitted nor kept
+            missing = set(missing)
+            if missing:
+                fitted = [i for i, row in enumerate(rows) if row["issue_id"] not in missing]
+                rows, vectors = [rows[i] for i in fitted], vectors[fitted]
+            coords = np.asarray(self._project(rows, vectors), dtype=np.float32)
+            del vectors
+        except JobCancelled as e:
+            self.refit_running = False
+            print(f"Re-fit of the {self.engine} layout stopped: {e}")
+            return
+        except Exception:
+            self.refit_running = False
+            raise
+        try:
+            with self._lock:
+                # Points added while the fit was running are re-placed in the new layout
+                fitted = {row["issue_id"]: i for i, row in enumerate(rows)}
+                late = [i for i, row in enumerate(self.rows) if row["issue_id"] not in fitted]
+                keep = [i for i, row in enumerate(rows) if row["issue_id"] in self._index]
+                late_vectors, late_missing = self.mirror.vectors([self.rows[i]["issue_id"] for i in late])
+                missing.update(late_missing)
+                placeable = [j for j, i in enumerate(late) if self.rows[i]["issue_id"] not in missing]
+                late, late_vectors = [late[j] for j in placeable], late_vectors[placeable]
+                positions = {rows[i]["issue_id"]: j for j, i in enumerate(keep)}
+                late_coords = place_points(self.mirror, late_vectors, positions, coords[keep])
+
+                # Kept points take their attributes from the current rows: sync_page may have refreshed them
+                self.rows = [self.rows[self._index[rows[i]["issue_id"]]] for i in keep] + [self.rows[i] for i in late]
+                self.coords = np.vstack([coords[keep], late_coords])
+                self.placed_since_fit = len(late)
+                self._changed()
+        finally:
+            self.refit_running = False
+        self.save()
+
+    def _project(self, rows, vectors):
+        """Project vectors to 2D on the job queue's process pool.
+
+        Identical projections (same engine and issues) that are requested
+        while one is queued or running share that job.
+        """
+        issues = hashlib.sha1("\n".join(row["issue_id"] for row in rows).encode("utf-8")).hexdigest()
+        with stage(f"projection_{self.engine}"):
+            return job_queue.run(("project", self.engine, issues), project_vectors, vectors, self.engine, name=f"project-{self.engine}")
+
+    def _replace(self, rows, coords):
+        with self._lock:
+            self.rows = rows
+            self.coords = np.asarray(coords, dtype=np.float32)
+            self.placed_since_fit = 0
+            self._changed()
+
+    def _keep(self, keep):
+        self.rows = [self.rows[i] for i in keep]
+        self.coords = self.coords[keep]
+        self._changed()
+
+    def _changed(self):
+        self._index = {row["issue_id"]: i for i, row in enumerate(self.rows)}
+        self.version = uuid.uuid4().hex
+        self._payloads = {}
+        self._views.clear()
+        self._grid = None
+
+    def payload(self, response_format: str = "json", compress: bool = False):
+        """Return the layout version and its `/graph-data` body, encoded once per version and format."""
+        with self._lock:
+            key = (response_format, compress)
+            if key not in self._payloads:
+                columns = graph_columns(self.rows)
+                columns["version"] = self.version
+                arrays = {"x": self.coords[:, 0], "y": self.coords[:, 1]}
+                self._payloads[key] = encode_graph(columns, arrays, response_format, compress)
+            return self.version, self._payloads[key]
+
+    def cached_view(self, key):
+        """Return the (version, body) of an encoded view stored under `key`, or None."""
+        return self._views.get(key)
+
+    def cache_view(self, key, version: str, body: bytes):
+        """Keep an encoded view until the layout changes; views of an older version are dropped."""
+        with self._lock:
+            if version == self.version:
+                self._views.set(key, (version, body))
+
+    def view(self, issue_ids=None, viewport=None, max_points: int = MAX_VIEW_POINTS):
+        """Return the columns and arrays of the layout as seen in a viewport.
+
+        `issue_ids` restricts the view to these issues, `viewport` to the points
+        within (x_min, x_max, y_min, y_max). Up to `max_points` points are
+        returned individually; beyond that they are aggregated into clusters
+        (cluster_x, cluster_y, cluster_size and cluster_color) without titles.
+        """
+        with self._lock:
+            if self._grid is None:
+                self._grid = GridIndex(self.coords)
+            grid, rows, coords, version = self._grid, self.rows, self.coords, self.version
+            selected = grid.query(*viewport) if viewport is not None else np.arange(len(rows))
+            if issue_ids is not None:
+                allowed = np.zeros(len(rows), dtype=bool)
+                allowed[[self._index[issue_id] for issue_id in issue_ids if issue_id in self._index]] = True
+                selected = selected[allowed[selected]]
+            selected_rows = [rows[i] for i in selected]
+
+        selected_coords = coords[selected]
+        if len(selected) <= max_points:
+            columns = graph_columns(selected_rows)
+            arrays = {"x": selected_coords[:, 0], "y": selected_coords[:, 1]}
+        else:
+            centroids, sizes, colors = cluster_points(selected_coords, [row["color"] for row in selected_rows], int(max_points ** 0.5))
+            columns = graph_columns([])
+            columns["cluster_color"] = colors
+            arrays = {"x": [], "y": [], "cluster_x": centroids[:, 0], "cluster_y": centroids[:, 1], "cluster_size": sizes}
+        columns["version"] = version
+        columns["total"] = len(selected)
+        return columns, arrays
+
+
+_layout_caches = {}
+
+
+def get_layout_cache(engine: str = None) -> LayoutCache:
+    """Return the layout cache for a projection engine, loading it from disk on first use."""
+    engine = engine or DEFAULT_PROJECTION_ENGINE
+    if engine not in _layout_caches:
+        cache = LayoutCache(engine)
+        cache.load()
+        _layout_caches[engine] = cache
+    return _layout_caches[engine]
+
+
+def loaded_layout_caches():
+    """Return the layout caches that are currently loaded."""
+    return list(_layout_caches.values())
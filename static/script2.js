@@ -3,21 +3,65 @@ $(document).ready(function () {
     const issueContainer = document.querySelector(".issue-container");
     const issueId = issueContainer.dataset.issueId;
 
-    // Create WebSocket URL dynamically using the issue ID
-    const websocket = new WebSocket(`ws://localhost:8000/ws/${issueId}`);
+    // The chat session of this issue survives reloads and reconnects of this tab
+    const sessionKey = `chat-session-${issueId}`;
+    let websocket = null;
+    let reconnectDelay = 1000;
+    // Close codes after which reconnecting may help: 1006 connection lost, 1011 server error,
+    // 1012 server restarting, 1013 too slow a client; 1000 means the server ended the chat
+    const RECONNECT_CODES = [1006, 1011, 1012, 1013];
     let message_finished = true;
     let ongoingBotMessageId = null;
     let suggestedReplyInProgress = false;
-
-    // WebSocket connection established
-    websocket.onopen = function (event) {
-        console.log("Connection established");
-    };
-
-    // WebSocket error
-    websocket.onerror = function (error) {
-        console.log("WebSocket error: ", error);
-    };
+    // Set by an error frame: the server closes the connection after errors it cannot recover from
+    let lastFrameWasError = false;
+
+    // Create WebSocket URL dynamically using the issue ID, resuming the session if there is one
+    function connect() {
+        const sessionId = sessionStorage.getItem(sessionKey);
+        const query = sessionId ? `?session=${encodeURIComponent(sessionId)}` : "";
+        websocket = new WebSocket(`ws://localhost:8000/ws/${issueId}${query}`);
+
+        // WebSocket connection established
+        websocket.onopen = function (event) {
+            console.log("Connection established");
+            reconnectDelay = 1000;
+        };
+
+        // WebSocket error
+        websocket.onerror = function (error) {
+            console.log("WebSocket error: ", error);
+        };
+
+        // Reconnect with backoff after an abnormal close (connection lost, server
+        // restarting or too slow a client); the server resumes the conversation
+        websocket.onclose = function (event) {
+            message_finished = true;
+            suggestedReplyInProgress = false;
+            if (!RECONNECT_CODES.includes(event.code) || lastFrameWasError) {
+                return;
+            }
+            setTimeout(connect, reconnectDelay);
+            reconnectDelay = Math.min(reconnectDelay * 2, 30000);
+        };
+
+        websocket.onmessage = handleFrame;
+    }
+
+    // Show the messages of a resumed conversation; the latest suggested reply goes back into its box
+    function showHistory(messages) {
+        $("#chat-history").empty();
+        for (const message of messages) {
+            if (message.suggested) {
+                $("#suggested-reply-content").text(message.content);
+                continue;
+            }
+            const item = $("<li></li>").addClass(message.role === "user" ? "user-response" : "bot-response");
+            item.append(`<span class='label'>${message.role === "user" ? "User:" : "Bot:"}</span> `);
+            item.append(document.createTextNode(message.content));
+            $("#chat-history").append(item);
+        }
+    }
 
     // Enable automatic text area resizing
     autosize(document.querySelector("#prompt-input"));
@@ -68,33 +112,48 @@ $(document).ready(function () {
         websocket.send("resolve_issue");
     });
 
-    // WebSocket message handling (responses from the server)
-    websocket.onmessage = function (event) {
-        if (event.data.startsWith("suggested_reply:")) {
-            const replyContent = event.data.replace("suggested_reply:", "");
-
-            if (replyContent === "__message_finished__") {
+    // WebSocket message handling: every frame is JSON {type, seq, data, done}.
+    // Streamed replies arrive as several frames, the last one with done set.
+    function handleFrame(event) {
+        const frame = JSON.parse(event.data);
+        lastFrameWasError = frame.type === "error";
+
+        if (frame.type === "session") {
+            sessionStorage.setItem(sessionKey, frame.data);
+        } else if (frame.type === "history") {
+            showHistory(JSON.parse(frame.data));
+        } else if (frame.type === "suggested_reply") {
+            // Append each chunk to the suggested reply container
+            $("#suggested-reply-content").append(frame.data);
+            if (frame.done) {
                 suggestedReplyInProgress = false;
-            } else {
-                // Append each chunk to the suggested reply container
-                $("#suggested-reply-content").append(replyContent);
             }
-        } else if (event.data === "__message_finished__") {
-            // Mark the end of a bot response
-            message_finished = true;
-        } else if (event.data === "Issue resolved and migrated to Solved.") {
-            // Show an alert indicating the migration was successful
-            alert("The issue has been successfully migrated to the Solved database.");
-        } else {
+        } else if (frame.type === "reply") {
             // Append the bot response to the ongoing response ID
             const botMessageElement = $("#" + ongoingBotMessageId);
-            botMessageElement.html(botMessageElement.html() + event.data);
+            botMessageElement.html(botMessageElement.html() + frame.data);
+            if (frame.done) {
+                // Mark the end of a bot response
+                message_finished = true;
+            }
+        } else if (frame.type === "resolved") {
+            // Show an alert indicating the migration was successful
+            alert("The issue has been successfully migrated to the Solved database.");
+        } else if (frame.type === "error") {
+            // A suggested reply that broke off is dropped rather than shown half-written
+            if (suggestedReplyInProgress) {
+                suggestedReplyInProgress = false;
+                $("#suggested-reply-content").empty();
+            }
+            alert(frame.data);
         }
 
         // Auto-scroll the chat container to the latest message
         const chatContainer = document.getElementById('chat-container');
         chatContainer.scrollTop = chatContainer.scrollHeight;
-    };
+    }
+
+    connect();
 
     // Handle "Copy" button click
     $("#copy-reply-btn").click(function () {
@@ -0,0 +1,233 @@
+import os
+import threading
+import numpy as np
+from vectorStore import VectorStore
+from collectionReader import iter_pages
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+MIRROR_DIR = os.getenv("VECTOR_MIRROR_DIR", "data/mirror")
+MIRROR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "1536"))
+# Nearest-neighbour search: "brute" (exact, BLAS) or "hnsw" (approximate, requires hnswlib)
+MIRROR_KNN = os.getenv("MIRROR_KNN", "brute")
+MIRRORED_COLLECTIONS = ("GithubIssues", "Solved")
+
+
+def default_vector(vector):
+    """Return the unnamed vector of an object (the client returns {"default": [...]})."""
+    if isinstance(vector, dict):
+        return vector.get("default")
+    return vector
+
+
+class VectorMirror:
+    """Local copy of a collection's vectors keyed by issue_id, with a nearest-neighbour index.
+
+    The vectors live in a memory-mapped VectorStore, so worker processes on
+    the same machine share the pages; each process picks up changes written
+    by another one through `refresh()`. Writes go through the store's file
+    lock, which reloads the index first, so the web workers and import.py can
+    update the same mirror concurrently. A mirror is only `complete` (holds
+    every object of the collection) after `mark_complete()`, which
+    rebuild_mirror and the full import call; otherwise callers must be ready
+    for missing ids. Search is an exact cosine kNN over the
+    mapped matrix, or an HNSW graph when `knn="hnsw"` and hnswlib is installed.
+    """
+
+    def __init__(self, collection_name: str, dimensions: int = MIRROR_DIMENSIONS, knn: str = MIRROR_KNN):
+        self.collection_name = collection_name
+        self.store = VectorStore(os.path.join(MIRROR_DIR, collection_name), dimensions)
+        self.knn = knn
+        if knn == "hnsw" and hnswlib is None:
+            print("hnswlib is not installed, falling back to brute-force kNN.")
+            self.knn = "brute"
+        self._lock = threading.Lock()
+        self._mtime = self._index_mtime()
+        self._search_index = None
+
+    def _index_mtime(self):
+        try:
+            return os.path.getmtime(self.store.index_path)
+        except OSError:
+            return None
+
+    def _changed(self):
+        self._search_index = None
+
+    @property
+    def complete_path(self):
+        return self.store.path + ".complete"
+
+    @property
+    def complete(self):
+        """True if the mirror was filled from (or started with) the whole collection."""
+        return os.path.exists(self.complete_path)
+
+    def mark_complete(self):
+        """Record that the mirror holds every object of the collection."""
+        os.makedirs(os.path.dirname(self.complete_path) or ".", exist_ok=True)
+        with open(self.complete_path, "w"):
+            pass
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, issue_id):
+        return issue_id in self.store
+
+    def refresh(self):
+        """Reload the index if another process updated the mirror."""
+        mtime = self._index_mtime()
+        if mtime != self._mtime:
+            with self._lock:
+                self.store.load()
+                self._mtime = mtime
+                self._changed()
+
+    def upsert(self, issue_ids, vectors):
+        """Add or replace the vectors of the given issues and persist the index."""
+        if not issue_ids:
+            return
+        with self._lock:
+            self.store.put_many(list(issue_ids), vectors)
+            self._mtime = self._index_mtime()
+            self._changed()
+
+    def upsert_objects(self, objects):
+        """Mirror the vectors of Weaviate objects (fetched with include_vector=True)."""
+        pairs = [(o.properties["issue_id"], default_vector(o.vector)) for o in objects if default_vector(o.vector)]
+        if pairs:
+            issue_ids, vectors = zip(*pairs)
+            self.upsert(list(issue_ids), np.asarray(vectors, dtype=np.float32))
+
+    def delete(self, issue_ids):
+        """Forget the vectors of the given issues."""
+        with self._lock:
+            self.store.delete_many(issue_ids)
+            self._mtime = self._index_mtime()
+            self._changed()
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.complete_path):
+                os.remove(self.complete_path)
+            self.store.clear()
+            self._mtime = self._index_mtime()
+            self._changed()
+
+    def vectors(self, issue_ids):
+        """Return the vectors of `issue_ids` as one matrix plus the ids that are not mirrored."""
+        self.refresh()
+        return self.store.get_many(list(issue_ids))
+
+    def _build_search_index(self):
+        matrix = self.store.matrix()
+        keys = self.store.row_keys()
+        if self.knn == "hnsw":
+            live = [row for row, key in enumerate(keys) if key is not None]
+            index = hnswlib.Index(space="cosine", dim=self.store.dimensions)
+            index.init_index(max_elements=max(len(live), 1), ef_construction=200, M=16)
+            if live:
+                index.add_items(np.asarray(matrix[live]), np.asarray(live))
+            index.set_ef(64)
+            return {"keys": keys, "hnsw": index, "size": len(live)}
+
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        alive = np.array([key is not None for key in keys], dtype=bool)
+        return {"keys": keys, "matrix": matrix, "norms": norms, "alive": alive}
+
+    def nearest(self, query, k: int = 5, exclude=()):
+        """Return up to k (issue_id, cosine similarity) pairs closest to `query`."""
+        self.refresh()
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = self._build_search_index()
+            index = self._search_index
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        exclude = set(exclude)
+        keys = index["keys"]
+
+        if "hnsw" in index:
+            count = min(index["size"], k + len(exclude))
+            if count == 0:
+                return []
+            rows, distances = index["hnsw"].knn_query(query, k=count)
+            candidates = [(keys[row], 1.0 - float(distance)) for row, distance in zip(rows[0], distances[0])]
+        else:
+            if len(keys) == 0:
+                return []
+            scores = (index["matrix"] @ query) / index["norms"]
+            scores[~index["alive"]] = -np.inf
+            count = min(len(scores), k + len(exclude))
+            rows = np.argpartition(-scores, count - 1)[:count]
+            rows = rows[np.argsort(-scores[rows])]
+            candidates = [(keys[row], float(scores[row])) for row in rows if np.isfinite(scores[row])]
+
+        return [(issue_id, score) for issue_id, score in candidates if issue_id not in exclude][:k]
+
+
+    def nearest_many(self, queries, k: int, allowed, batch_size: int = 256):
+        """Return, for each query, up to k (issue_id, cosine similarity) pairs among the `allowed` issue_ids.
+
+        An exact search over the mapped matrix, a batch of queries per matrix
+        product, for bulk lookups like placing new points in the graph layout.
+        """
+        self.refresh()
+        with self._lock:
+            matrix = self.store.matrix()
+            keys = self.store.row_keys()
+        results = [[] for _ in range(len(queries))]
+        mask = np.fromiter((key is not None and key in allowed for key in keys), dtype=bool, count=len(keys))
+        count = min(k, int(mask.sum()))
+        if count == 0:
+            return results
+
+        norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+        norms[norms == 0] = 1.0
+        queries = np.asarray(queries, dtype=np.float32)
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            batch = batch / np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12)
+            scores = (batch @ matrix.T) / norms
+            scores[:, ~mask] = -np.inf
+            rows = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for i, (row_ids, row_scores) in enumerate(zip(rows, np.take_along_axis(scores, rows, axis=1))):
+                results[start + i] = [(keys[row], float(score)) for row, score in zip(row_ids, row_scores)]
+        return results
+
+
+_mirrors = {}
+
+
+def get_mirror(collection_name: str) -> VectorMirror:
+    """Return the process-wide mirror of a collection."""
+    if collection_name not in _mirrors:
+        _mirrors[collection_name] = VectorMirror(collection_name)
+    return _mirrors[collection_name]
+
+
+def rebuild_mirror(client, collection_name: str):
+    """Re-create the mirror of a collection from Weaviate, page by page."""
+    mirror = get_mirror(collection_name)
+    mirror.clear()
+    collection = client.collections.get(collection_name)
+    for page in iter_pages(collection, include_vector=True, return_properties=["issue_id"]):
+        mirror.upsert_objects(page)
+    mirror.store.compact()
+    mirror.mark_complete()
+    print(f"Mirrored {len(mirror)} vectors of {collection_name}.")
+
+
+# Main execution
+if __name__ == "__main__":
+    from weaviateClient import connect_to_weaviate
+
+    with connect_to_weaviate() as client:
+        for name in MIRRORED_COLLECTIONS:
+            rebuild_mirror(client, name)
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class VectorStore:
+    """Float32 vectors in a memory-mapped file on disk, addressed by string keys.
+
+    Rows live in `<path>.f32` and the key -> row index in `<path>.json`. New
+    rows are appended to the file, updated keys are overwritten in place and
+    deleted keys only leave the index until `compact()` rewrites the file.
+    Reads go through np.memmap, so several processes share the same pages.
+
+    Every write holds an exclusive lock on `<path>.lock` (flock, where the
+    platform has it), reloads the index from disk, applies its change and
+    saves the index before releasing the lock, so writers in different
+    processes (web workers, import.py) never drop each other's rows.
+    """
+
+    def __init__(self, path: str, dimensions: int):
+        self.path = path
+        self.dimensions = dimensions
+        self.rows = {}
+        self._count = 0
+        self._matrix = None
+        self._lock = threading.RLock()
+        self.load()
+
+    @property
+    def data_path(self):
+        return self.path + ".f32"
+
+    @property
+    def index_path(self):
+        return self.path + ".json"
+
+    @property
+    def lock_path(self):
+        return self.path + ".lock"
+
+    def load(self):
+        """Read the index from disk; without an index file the store is empty."""
+        with self._lock:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, encoding="utf-8") as f:
+                    index = json.load(f)
+                if index["dimensions"] != self.dimensions:
+                    raise ValueError(f"{self.path} holds {index['dimensions']}-d vectors, expected {self.dimensions}")
+                self.rows = index["rows"]
+                self._count = index["count"]
+            else:
+                self.rows = {}
+                self._count = 0
+            self._matrix = None
+
+    def _save(self):
+        """Flush the rows and write the index atomically."""
+        if self._matrix is not None:
+            self._matrix.flush()
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimensions": self.dimensions, "count": self._count, "rows": self.rows}, f)
+        os.replace(tmp_path, self.index_path)
+
+    @contextmanager
+    def _write(self):
+        """Lock the store against other processes, reload the index and save it after the change."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.load()
+                    yield
+                    self._save()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _map(self):
+        if self._matrix is None and self._count:
+            self._matrix = np.memmap(self.data_path, dtype=np.float32, mode="r+", shape=(self._count, self.dimensions))
+        return self._matrix
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def keys(self):
+        return list(self.rows)
+
+    def matrix(self):
+        """Return the whole memory-mapped matrix, including rows of deleted keys."""
+        with self._lock:
+            matrix = self._map()
+            return np.zeros((0, self.dimensions), dtype=np.float32) if matrix is None else matrix
+
+    def row_keys(self):
+        """Return the key of every row of `matrix()` (None for rows of deleted keys)."""
+        with self._lock:
+            keys = [None] * self._count
+            for key, row in self.rows.items():
+                keys[row] = key
+            return keys
+
+    def get(self, key):
+        """Return a copy of the vector stored under `key`, or None."""
+        with self._lock:
+            row = self.rows.get(key)
+            return None if row is None else np.array(self._map()[row])
+
+    def get_many(self, keys):
+        """Return the vectors of `keys` as one matrix plus the keys that were not found (left as zeros)."""
+        with self._lock:
+            matrix = np.zeros((len(keys), self.dimensions), dtype=np.float32)
+            positions = [(i, self.rows[key]) for i, key in enumerate(keys) if key in self.rows]
+            if positions:
+                targets, rows = zip(*positions)
+                matrix[list(targets)] = self._map()[list(rows)]
+            missing = [key for key in keys if key not in self.rows]
+            return matrix, missing
+
+    def put_many(self, keys, vectors):
+        """Store vectors under `keys`, overwriting existing keys and appending new ones."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dimensions)
+        with self._write():
+            appended = []
+            for key, vector in zip(keys, vectors):
+                row = self.rows.get(key)
+                if row is None:
+                    self.rows[key] = self._count + len(appended)
+                    appended.append(vector)
+                elif row >= self._count:
+                    appended[row - self._count] = vector
+                else:
+                    self._map()[row] = vector
+            if appended:
+                if self._matrix is not None:
+                    self._matrix.flush()
+                    self._matrix = None
+                # Drop rows appended by a run that crashed before saving its index
+                expected_size = self._count * self.dimensions * 4
+                if os.path.exists(self.data_path) and os.path.getsize(self.data_path) > expected_size:
+                    os.truncate(self.data_path, expected_size)
+                with open(self.data_path, "ab") as f:
+                    f.write(np.ascontiguousarray(appended, dtype=np.float32).tobytes())
+                self._count += len(appended)
+
+    def delete_many(self, keys):
+        """Forget the given keys; their rows are reclaimed by `compact()`."""
+        with self._write():
+            for key in keys:
+                self.rows.pop(key, None)
+
+    def clear(self):
+        """Remove all vectors and delete the files."""
+        with self._write():
+            self._matrix = None
+            self.rows = {}
+            self._count = 0
+            if os.path.exists(self.data_path):
+                os.remove(self.data_path)
+
+    def compact(self):
+        """Rewrite the file with only the live rows."""
+        with self._write():
+            keys = list(self.rows)
+            matrix, _ = self.get_many(keys)
+            self._matrix = None
+            tmp_path = self.data_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(matrix.tobytes())
+            os.replace(tmp_path, self.data_path)
+            self.rows = {key: i for i, key in enumerate(keys)}
+            self._count = len(keys)
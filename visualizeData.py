@@ -1,31 +1,18 @@
-import weaviate
-import os
-from dotenv import load_dotenv
 import json
-from sklearn.manifold import TSNE
-import matplotlib.pyplot as plt
+import os
+from collections import Counter
 import numpy as np
+from weaviateClient import connect_to_weaviate
+from collectionReader import iter_pages
+from vectorMirror import get_mirror
 
-# Load environment variables
-load_dotenv()
-
-def connect_to_weaviate():
-    """Connect to the Weaviate cluster."""
-    return weaviate.connect_to_wcs(
-        cluster_url=os.getenv("WCS_URL"),
-        auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WCS_API_KEY")),
-        headers={
-            "X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]
-        }
-    )
-
-def show_collection(client, collection_name):
-    """Returns all objects in a collection."""
+def show_collection(client, collection_name, include_vector=True):
+    """Returns all objects in a collection, fetched page by page."""
     collection = client.collections.get(collection_name)
-    response = collection.query.fetch_objects(
-        include_vector=True
-    )
-    return response
+    objects = []
+    for page in iter_pages(collection, include_vector=include_vector):
+        objects.extend(page)
+    return objects
 
 def format_output(objects):
     """Format output to be JSON serializable and extract vectors."""
@@ -43,123 +30,174 @@ def pretty_print_properties(objects):
     pretty_json = json.dumps(properties_list, indent=4)
     print(pretty_json)
 
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.manifold import TSNE
-
-def visualize_vectors(vectors):
-    """Use t-SNE to reduce vector dimensions, plot them with titles and colors based on urgency, and output the collection with reduced vectors."""
-    cleaned_vectors = []
-    titles = []  # List to store titles for annotations
-    markers = []  # List to store marker shapes (triangle or circle)
-    urgencies = []  # List to store urgency levels for color coding
-    colors = {1: 'green', 2: 'yellow', 3: 'orange', 4: 'red'}  # Map urgency to colors
-    
-    for vector_info in vectors:
-        vector = vector_info["vector"]["default"]
-        title = vector_info["properties"]["title"]
+# Fixed seed so repeated layouts of the same vectors do not jump around
+RANDOM_STATE = 42
+# Embeddings are reduced to this many dimensions with PCA before t-SNE
+PCA_DIMENSIONS = int(os.getenv("PCA_DIMENSIONS", "50"))
+TSNE_PERPLEXITY = float(os.getenv("TSNE_PERPLEXITY", "5"))
+
+# Available projection engines:
+#   pca      - PCA straight to 2D, fastest and deterministic
+#   random   - sparse random projection to 2D, linear time and memory
+#   tsne     - PCA pre-reduction followed by Barnes-Hut t-SNE
+#   fft-tsne - PCA pre-reduction followed by FFT-accelerated t-SNE with
+#              approximate kNN (requires openTSNE, falls back to `tsne`)
+PROJECTION_ENGINES = ("pca", "random", "tsne", "fft-tsne")
+DEFAULT_PROJECTION_ENGINE = os.getenv("PROJECTION_ENGINE", "tsne")
+
+def clean_vectors(vectors):
+    """Stack the vectors into one float32 matrix and drop missing or non-finite rows.
+
+    Returns the matrix together with the indices of the objects that were kept.
+    """
+    raw = [(vector_info.get("vector") or {}).get("default") for vector_info in vectors]
+    try:
+        matrix = np.asarray(raw, dtype=np.float32)
+        valid = np.ones(len(raw), dtype=bool)
+    except (ValueError, TypeError):
+        matrix = None
+
+    if matrix is None or matrix.ndim != 2:
+        # Missing or ragged vectors: copy the rows with the common length and mask the rest
+        lengths = Counter(len(v) for v in raw if v is not None)
+        dimensions = lengths.most_common(1)[0][0] if lengths else 0
+        matrix = np.zeros((len(raw), dimensions), dtype=np.float32)
+        valid = np.zeros(len(raw), dtype=bool)
+        for i, vector in enumerate(raw):
+            if vector is None or len(vector) != dimensions:
+                continue
+            try:
+                matrix[i] = vector
+                valid[i] = True
+            except (ValueError, TypeError):
+                print("Error converting vector to float:", vector)
+
+    valid &= np.isfinite(matrix).all(axis=1)
+    if not valid.all():
+        print(f"Dropped {int((~valid).sum())} missing or non-finite vectors.")
+    kept = np.flatnonzero(valid)
+    return matrix[kept], kept
+
+def graph_row(properties):
+    """Return the attributes of a graph point (title, id, marker, urgency color)."""
+    colors = {1: 'green', 2: 'yellow', 3: 'orange', 4: 'red'}
+    try:
+        urgency = int(properties["urgency"])
+    except (ValueError, TypeError):
+        urgency = 2  # Default urgency
+
+    return {
+        "title": properties["title"],
+        "issue_id": properties["issue_id"],
+        "marker": "^" if properties["type"] == "pull request" else "o",
+        "color": colors.get(urgency, colors[2])
+    }
+
+def clean_graph_rows(vectors):
+    """Collect the finite vectors as one matrix together with the attributes of each graph point."""
+    matrix, kept = clean_vectors(vectors)
+    rows = [graph_row(vectors[i]["properties"]) for i in kept]
+    return matrix, rows
+
+# sklearn, openTSNE and matplotlib are imported where they are used: they take
+# seconds to import and most importers (the web app) never project in-process
+
+def _pca_reduce(matrix, dimensions):
+    from sklearn.decomposition import PCA
+
+    dimensions = min(dimensions, matrix.shape[0], matrix.shape[1])
+    if dimensions >= matrix.shape[1]:
+        return matrix
+    return PCA(n_components=dimensions, random_state=RANDOM_STATE).fit_transform(matrix)
+
+def project_vectors(matrix, engine=None):
+    """Reduce the vectors to two dimensions with the given projection engine."""
+    engine = engine or DEFAULT_PROJECTION_ENGINE
+    if engine not in PROJECTION_ENGINES:
+        raise ValueError(f"Unknown projection engine: {engine}")
+
+    if engine == "pca":
+        return _pca_reduce(matrix, 2)
+    if engine == "random":
+        from sklearn.random_projection import SparseRandomProjection
+
+        projection = SparseRandomProjection(n_components=2, random_state=RANDOM_STATE)
+        return projection.fit_transform(matrix)
+
+    reduced = _pca_reduce(matrix, PCA_DIMENSIONS)
+    perplexity_value = min(TSNE_PERPLEXITY, len(reduced) - 1)
+    if engine == "fft-tsne":
         try:
-            urgency = int(vector_info["properties"]["urgency"])  # Attempt to parse the urgency value
-        except (ValueError, TypeError):
-            urgency = 2  # Set default urgency to 2 if parsing fails
+            from openTSNE import TSNE as FFTTSNE
+        except ImportError:
+            FFTTSNE = None
+        if FFTTSNE is not None:
+            tsne = FFTTSNE(
+                n_components=2,
+                perplexity=perplexity_value,
+                neighbors="approx",
+                negative_gradient_method="fft",
+                random_state=RANDOM_STATE,
+                n_jobs=-1
+            )
+            return np.asarray(tsne.fit(reduced))
+        print("openTSNE is not installed, falling back to Barnes-Hut t-SNE.")
+
+    from sklearn.manifold import TSNE
+
+    tsne = TSNE(n_components=2, perplexity=perplexity_value, learning_rate=100, method="barnes_hut", random_state=RANDOM_STATE)
+    return tsne.fit_transform(reduced)
+
+def visualize_vectors(vectors, engine=None):
+    """Reduce vector dimensions, plot them with titles and colors based on urgency, and output the collection with reduced vectors."""
+    import matplotlib.pyplot as plt
+
+    matrix, kept = clean_vectors(vectors)
+
+    if len(matrix) > 1:
+        vectors_reduced = project_vectors(matrix, engine)
+        rows = [graph_row(vectors[i]["properties"]) for i in kept]
 
-        pr_type = vector_info["properties"]["type"]
-
-        try:
-            vector_np = np.array(vector, dtype=float)
-            if np.isfinite(vector_np).all():
-                cleaned_vectors.append(vector_np)
-                titles.append(title)
-                urgencies.append(colors[urgency])  # Map urgency to corresponding color
-                
-                # Set marker shapes based on whether it's a pull request or issue
-                if pr_type == "pull request":
-                    markers.append("^")  # Triangle marker
-                else:
-                    markers.append("o")  # Circle marker
-            else:
-                print("Non-finite numbers found in vector:", vector)
-        except TypeError:
-            print("Error converting vector to float:", vector)
-    
-    if len(cleaned_vectors) > 1:
-        vectors_np = np.array(cleaned_vectors)
-        perplexity_value = min(5, len(vectors_np) - 1)
-        tsne = TSNE(n_components=2, perplexity=perplexity_value, learning_rate=100)
-        vectors_reduced = tsne.fit_transform(vectors_np)
-        
         # Prepare to output the collection with the reduced vectors
         collection_with_reduced = []
         plt.figure(figsize=(12, 8))
-        
-        for i, (txt, marker, color) in enumerate(zip(titles, markers, urgencies)):
-            x, y = vectors_reduced[i]
-            plt.scatter(x, y, alpha=0.5, color=color, marker=marker, edgecolor="black")  # Use black outline
-            plt.annotate(txt, (x, y))
-            
+
+        for (x, y), i, row in zip(vectors_reduced, kept, rows):
+            plt.scatter(x, y, alpha=0.5, color=row["color"], marker=row["marker"], edgecolor="black")  # Use black outline
+            plt.annotate(row["title"], (x, y))
+
             reduced_vector_dict = {
                 "properties": vectors[i]["properties"],  # Copy original properties
-                "reduced_vector": vectors_reduced[i].tolist()  # Save reduced vector as a list
+                "reduced_vector": [float(x), float(y)]  # Save reduced vector as a list
             }
             collection_with_reduced.append(reduced_vector_dict)
-        
-        plt.title('2D Visualization of Vectors using t-SNE with Titles and Urgency Colors')
+
+        plt.title(f'2D Visualization of Vectors ({engine or DEFAULT_PROJECTION_ENGINE}) with Titles and Urgency Colors')
         plt.xlabel('Dimension 1')
         plt.ylabel('Dimension 2')
         plt.show()
-        
+
         # Output the enhanced collection data
         print(json.dumps(collection_with_reduced, indent=4))
     else:
-        print("Not enough valid vectors to perform t-SNE.")
+        print("Not enough valid vectors to project.")
 
 # In visualizeData.py or wherever `prepare_graph_data` is implemented
 
-def prepare_graph_data(vectors):
-    """Prepare graph data using t-SNE and return reduced vectors as JSON."""
-    cleaned_vectors = []
-    titles = []
-    issue_ids = []  # Add a list to store issue IDs
-    markers = []
-    urgencies = []
-    colors = {1: 'green', 2: 'yellow', 3: 'orange', 4: 'red'}
+def graph_points(rows, vectors_reduced):
+    """Combine the point attributes with their 2D positions."""
+    return [
+        {"title": row["title"], "issue_id": row["issue_id"], "x": float(x), "y": float(y), "marker": row["marker"], "color": row["color"]}
+        for row, (x, y) in zip(rows, vectors_reduced)
+    ]
 
-    for vector_info in vectors:
-        vector = vector_info["vector"]["default"]
-        title = vector_info["properties"]["title"]
-        issue_id = vector_info["properties"]["issue_id"]  # Add issue_id to the data
-        try:
-            urgency = int(vector_info["properties"]["urgency"])
-        except (ValueError, TypeError):
-            urgency = 2  # Default urgency
-
-        pr_type = vector_info["properties"]["type"]
+def prepare_graph_data(vectors, engine=None):
+    """Prepare graph data with the projection engine and return reduced vectors as JSON."""
+    matrix, rows = clean_graph_rows(vectors)
 
-        try:
-            vector_np = np.array(vector, dtype=float)
-            if np.isfinite(vector_np).all():
-                cleaned_vectors.append(vector_np)
-                titles.append(title)
-                issue_ids.append(issue_id)  # Append to the issue ID list
-                urgencies.append(colors[urgency])
-                markers.append("^" if pr_type == "pull request" else "o")
-            else:
-                print("Non-finite numbers found in vector:", vector)
-        except TypeError:
-            print("Error converting vector to float:", vector)
-
-    if len(cleaned_vectors) > 1:
-        vectors_np = np.array(cleaned_vectors)
-        perplexity_value = min(5, len(vectors_np) - 1)
-        tsne = TSNE(n_components=2, perplexity=perplexity_value, learning_rate=100)
-        vectors_reduced = tsne.fit_transform(vectors_np)
-
-        reduced_vectors = [
-            {"title": titles[i], "issue_id": issue_ids[i], "x": float(x), "y": float(y), "marker": markers[i], "color": urgencies[i]}
-            for i, (x, y) in enumerate(vectors_reduced)
-        ]
-
-        return json.dumps(reduced_vectors, indent=4)
+    if len(matrix) > 1:
+        vectors_reduced = project_vectors(matrix, engine)
+        return json.dumps(graph_points(rows, vectors_reduced), indent=4)
 
     else:
         return {"error": "Not enough valid vectors to perform t-SNE."}
@@ -170,8 +208,19 @@ if __name__ == "__main__":
     # Connect to Weaviate
     with connect_to_weaviate() as client:  # Ensure the connection is closed properly
         # Perform near text search
-        collection = show_collection(client, "Solved")
-        collection_output = format_output(collection.objects)
+        # Take the vectors from the local mirror when it holds the whole collection
+        mirror = get_mirror("Solved")
+        objects = show_collection(client, "Solved", include_vector=not mirror.complete)
+        if mirror.complete:
+            vectors, missing = mirror.vectors([o.properties["issue_id"] for o in objects])
+            missing = set(missing)
+            collection_output = [
+                {"properties": o.properties, "vector": {"default": vector}}
+                for o, vector in zip(objects, vectors) if o.properties["issue_id"] not in missing
+            ]
+        else:
+            mirror.upsert_objects(objects)
+            collection_output = format_output(objects)
 
         # Pretty print all properties only
         pretty_print_properties(collection_output)
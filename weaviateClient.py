@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+import weaviate
+from dotenv import load_dotenv
+from metrics import stage
+
+# Load environment variables
+load_dotenv()
+
+# Seconds between readiness checks of the shared client
+HEALTH_CHECK_INTERVAL = float(os.getenv("WEAVIATE_HEALTH_CHECK_INTERVAL", "30"))
+
+
+def connect_to_weaviate():
+    """Connect to the Weaviate cluster with a blocking client (used by the scripts)."""
+    return weaviate.connect_to_wcs(
+        cluster_url=os.getenv("WCS_URL"),
+        auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WCS_API_KEY")),
+        headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
+    )
+
+
+class WeaviateClientPool:
+    """Keeps one long-lived async Weaviate client that is shared by all handlers.
+
+    The client is opened once in the application lifespan hook. `get()` hands out
+    the shared client and re-checks its readiness at most every
+    `health_check_interval` seconds, reconnecting if the cluster went away.
+    """
+
+    def __init__(self, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.health_check_interval = health_check_interval
+        self._client = None
+        self._last_check = 0.0
+        self._lock = asyncio.Lock()
+
+    def _create_client(self):
+        return weaviate.use_async_with_weaviate_cloud(
+            cluster_url=os.getenv("WCS_URL"),
+            auth_credentials=weaviate.auth.AuthApiKey(os.getenv("WCS_API_KEY")),
+            headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
+        )
+
+    async def _is_healthy(self) -> bool:
+        if self._client is None or not self._client.is_connected():
+            return False
+        try:
+            with stage("weaviate_health_check"):
+                return await self._client.is_ready()
+        except Exception as e:
+            print(f"Weaviate health check failed: {e}")
+            return False
+
+    async def _close_client(self):
+        if self._client is None:
+            return
+        try:
+            await self._client.close()
+        except Exception as e:
+            print(f"Error closing Weaviate client: {e}")
+        self._client = None
+
+    async def connect(self):
+        """Open the shared client (called from the lifespan hook)."""
+        async with self._lock:
+            if await self._is_healthy():
+                return self._client
+            await self._close_client()
+            client = self._create_client()
+            with stage("weaviate_connect"):
+                await client.connect()
+            self._client = client
+            self._last_check = time.monotonic()
+            return client
+
+    async def get(self):
+        """Return the shared client, reconnecting if the last health check failed."""
+        client = self._client
+        if (
+            client is not None
+            and client.is_connected()
+            and time.monotonic() - self._last_check < self.health_check_interval
+        ):
+            return client
+
+        if await self._is_healthy():
+            self._last_check = time.monotonic()
+            return self._client
+        return await self.connect()
+
+    async def close(self):
+        """Close the shared client (called when the application shuts down)."""
+        async with self._lock:
+            await self._close_client()
+
+
+weaviate_pool = WeaviateClientPool()